@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "product_hunt.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -124,3 +126,131 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Scrapers
+# HTTP sessions are pooled per host and reused across pages, keywords and threads.
+
+SCRAPER_TIMEOUT = int(os.environ.get("SCRAPER_TIMEOUT", 10))
+SCRAPER_POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", 10))
+SCRAPER_MAX_RETRIES = int(os.environ.get("SCRAPER_MAX_RETRIES", 2))
+SCRAPER_BACKOFF_FACTOR = float(os.environ.get("SCRAPER_BACKOFF_FACTOR", 0.5))
+
+# Sites scraped besides (or replacing, by name) the built-in ones of
+# product_hunt/scrapers/sites.py: a YAML or JSON file of site definitions.
+SCRAPER_SITES_FILE = os.environ.get("SCRAPER_SITES_FILE", "")
+
+# On-disk cache of fetched pages (product_hunt.scrapers.httpcache). Pages younger
+# than SCRAPER_HTTP_CACHE_MAX_AGE seconds are reused without a request; older ones
+# are revalidated with ETag/Last-Modified. Set SCRAPER_HTTP_CACHE_DIR to "" to disable.
+SCRAPER_HTTP_CACHE_DIR = os.environ.get(
+    "SCRAPER_HTTP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ecommerce_scraping_http_cache")
+)
+SCRAPER_HTTP_CACHE_MAX_SIZE = int(os.environ.get("SCRAPER_HTTP_CACHE_MAX_SIZE", 256 * 1024 * 1024))
+SCRAPER_HTTP_CACHE_MAX_AGE = int(os.environ.get("SCRAPER_HTTP_CACHE_MAX_AGE", 15 * 60))
+
+# Politeness: every HTTP request waits for a per-host token bucket. Rates are
+# requests per second keyed by website name (0 disables the limit); sites not listed
+# use 1 request/s.
+# Set SCRAPER_RATE_LIMIT_DIR to share the buckets between processes.
+SCRAPER_RATE_LIMITS = {
+    "Amazon": 1.0,
+    "Ebay": 2.0,
+    "Newegg": 1.0,
+}
+SCRAPER_RATE_LIMIT_BURST = int(os.environ.get("SCRAPER_RATE_LIMIT_BURST", 1))
+SCRAPER_RATE_LIMIT_DIR = os.environ.get("SCRAPER_RATE_LIMIT_DIR") or None
+
+# Async engine (product_hunt.scrapers.engine): results pages per site, concurrent
+# requests per host, and timeouts in seconds for one page request and for a whole keyword.
+SCRAPER_MAX_PAGES = int(os.environ.get("SCRAPER_MAX_PAGES", 2))
+SCRAPER_HOST_CONCURRENCY = int(os.environ.get("SCRAPER_HOST_CONCURRENCY", 4))
+SCRAPER_PAGE_TIMEOUT = float(os.environ.get("SCRAPER_PAGE_TIMEOUT", 30))
+SCRAPER_KEYWORD_TIMEOUT = float(os.environ.get("SCRAPER_KEYWORD_TIMEOUT", 120))
+
+# Parser processes (product_hunt.scrapers.pipeline) for the CPU-bound parse and
+# sentiment stage; 0 parses in threads. Set it to about the number of cores.
+SCRAPER_PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", 0))
+
+# Scraped products are upserted with bulk_create in batches of this many rows.
+SCRAPER_DB_BATCH_SIZE = int(os.environ.get("SCRAPER_DB_BATCH_SIZE", 500))
+
+# Incremental scraping: products whose scraped fields hash to the fingerprint stored
+# with them keep their stored sentiment and are not rewritten, only their scraped_at.
+SCRAPER_SKIP_UNCHANGED = os.environ.get("SCRAPER_SKIP_UNCHANGED", "1") == "1"
+
+# Scrape jobs (product_hunt.jobs). scrape_and_store queues a job and returns its id.
+# Jobs are run by `manage.py scrape_worker`; SCRAPE_WORKER_THREADS additionally runs
+# that many workers inside each web process (set it to 0 when dedicated workers run).
+SCRAPE_WORKER_THREADS = int(os.environ.get("SCRAPE_WORKER_THREADS", 2))
+SCRAPE_JOB_TIMEOUT = int(os.environ.get("SCRAPE_JOB_TIMEOUT", 600))
+SCRAPE_JOB_MAX_WAIT = float(os.environ.get("SCRAPE_JOB_MAX_WAIT", 30))
+SCRAPE_JOB_POLL_INTERVAL = float(os.environ.get("SCRAPE_JOB_POLL_INTERVAL", 0.5))
+
+# Freshness of stored results, in seconds per website name (SCRAPE_CACHE_TTL for
+# sites not listed). scrape_and_store serves stored products right away and queues
+# a background refresh of the sites whose last finished scrape job of the keyword is
+# older.
+SCRAPE_CACHE_TTL = int(os.environ.get("SCRAPE_CACHE_TTL", 6 * 60 * 60))
+SCRAPE_CACHE_TTLS = {
+    "Amazon": 6 * 60 * 60,
+    "Ebay": 3 * 60 * 60,
+    "Newegg": 12 * 60 * 60,
+}
+
+# Cache of the read API responses (product_hunt.apicache), invalidated per keyword
+# when scrapes save products. CACHE_BACKEND=file shares the cache between processes,
+# which is needed when scrape workers run outside the web processes.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[os.environ.get("CACHE_BACKEND", "locmem")],
+        "LOCATION": os.environ.get(
+            "CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "ecommerce_scraping_cache")
+        ),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000))},
+    }
+}
+API_CACHE_ALIAS = "default"
+API_CACHE_TIMEOUT = int(os.environ.get("API_CACHE_TIMEOUT", 300))
+
+# Pagination: API pages are cursor-based (?cursor=, ?page_size= up to API_MAX_PAGE_SIZE);
+# the HTML product list uses ?page=.
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+PRODUCT_LIST_PAGE_SIZE = int(os.environ.get("PRODUCT_LIST_PAGE_SIZE", 50))
+
+# Logging is configured here once instead of by each scraper. Scrapers log to the
+# root logger, the app modules to "product_hunt.*"; LOG_LEVEL sets both.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(levelname)s:%(name)s:%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+    },
+    "root": {"handlers": ["console"], "level": os.environ.get("LOG_LEVEL", "INFO")},
+    "loggers": {
+        # Django's own console handler only logs when DEBUG is on; use the root one.
+        "django": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Opt-in profiling (product_hunt.profiling). When enabled, a request is profiled if
+# it sends the PROFILING_HEADER header with PROFILING_TOKEN (any value when DEBUG is
+# on) or is picked by PROFILING_SAMPLE_RATE; scrape jobs by PROFILING_JOB_SAMPLE_RATE.
+# Summarize the profiles with `manage.py profile_summary`.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "ecommerce_scraping_profiles"))
+PROFILING_MODE = os.environ.get("PROFILING_MODE", "cprofile")  # or "sampling"
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get("PROFILING_SAMPLE_INTERVAL", 0.005))
+PROFILING_HEADER = "X-Profile"
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0.0))
+PROFILING_JOB_SAMPLE_RATE = float(os.environ.get("PROFILING_JOB_SAMPLE_RATE", 0.0))
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", 500))
@@ -0,0 +1,141 @@
+"""
+Response cache of the read API endpoints.
+
+Responses are stored in the Django cache under a key built from the normalized
+query, the other query parameters (pagination) and a set of version tokens. Writes
+never delete entries; they replace the version tokens instead, which orphans every
+key built from the old ones:
+
+- keyword searches depend on one token per prefix of each query term. Saving
+  products for a keyword replaces the tokens of all prefixes of its terms, so exactly
+  the queries whose results can change ("iph" for "iphone 15") are invalidated;
+- name searches depend on one token replaced by every product write;
+- every key depends on a global token, replaced by invalidate_all().
+"""
+import functools
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+from .search import search_terms
+
+GENERATION_KEY = 'apicache:generation'
+NAMES_KEY = 'apicache:names'
+TERM_KEY = 'apicache:term:{}'
+
+# Longer terms are versioned by their first MAX_PREFIX characters only.
+MAX_PREFIX = 32
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _term_keys(terms):
+    return [TERM_KEY.format(term[:MAX_PREFIX]) for term in terms]
+
+
+def _prefix_keys(text):
+    keys = set()
+    for term in search_terms(text):
+        term = term[:MAX_PREFIX]
+        keys.update(TERM_KEY.format(term[:length]) for length in range(1, len(term) + 1))
+    return keys
+
+
+def _versions(cache, keys):
+    """
+    Returns the current token of every version key, creating the missing ones.
+
+    A missing token (never set, or evicted) gets a new random value rather than a
+    default, so keys built before the eviction cannot come back to life.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    get_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def response_key(endpoint, field, text, params):
+    """
+    Builds the cache key of one API response.
+
+    Parameters:
+        endpoint (str): Name of the view.
+        field (str): The searched Product field, 'keyword' or 'name'.
+        text (str): The search string.
+        params (dict): The other query parameters, e.g. pagination.
+
+    Returns:
+        str: The cache key.
+    """
+    terms = search_terms(text)
+    version_keys = [GENERATION_KEY] + (_term_keys(terms) if field == 'keyword' else [NAMES_KEY])
+    versions = _versions(get_cache(), version_keys)
+    raw = '\n'.join([' '.join(terms), repr(sorted(params.items()))] + versions)
+    return f"apicache:response:{endpoint}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def cache_response(field, param, cache_statuses=(200, 404)):
+    """
+    Decorator caching the responses of a DRF view that searches Products by `field`.
+
+    Must be applied below @api_view. Requests without the search parameter are passed
+    through, so the view still answers them with its own error.
+
+    Parameters:
+        field (str): The searched Product field, 'keyword' or 'name'.
+        param (str): The query parameter holding the search string.
+        cache_statuses (tuple, optional): Response statuses worth caching.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            text = request.query_params.get(param)
+            if not text:
+                return view(request, *args, **kwargs)
+            params = {key: value for key, value in request.query_params.items() if key != param}
+            key = response_key(view.__name__, field, text, params)
+            cache = get_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                data, status_code = cached
+                return Response(data, status=status_code)
+            response = view(request, *args, **kwargs)
+            if response.status_code in cache_statuses:
+                cache.set(key, (response.data, response.status_code), getattr(settings, 'API_CACHE_TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_keyword(keyword):
+    """
+    Invalidates the cached responses that can change when products are saved for the keyword.
+    """
+    invalidate_keywords([keyword])
+
+
+def invalidate_keywords(keywords):
+    """
+    Invalidates the cached responses of several keywords at once, e.g. of every keyword
+    linked to a set of changed products.
+    """
+    keys = {NAMES_KEY}
+    for keyword in keywords:
+        keys |= _prefix_keys(keyword)
+    _bump(keys)
+
+
+def invalidate_all():
+    """
+    Invalidates every cached API response.
+    """
+    _bump([GENERATION_KEY])
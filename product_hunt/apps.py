@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class ProductHuntConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "product_hunt"
+
+    def ready(self):
+        from .profiling import install_query_hook, profiling_enabled
+        from .search import ensure_search_index
+
+        def create_search_index(using, **kwargs):
+            ensure_search_index(using)
+
+        # The full-text index lives outside the model state, so it is (re)created after every migrate.
+        post_migrate.connect(create_search_index, sender=self, weak=False)
+
+        if profiling_enabled():
+            # Lets profiles count the queries of every thread working for a profiled request or job.
+            connection_created.connect(install_query_hook, weak=False)
@@ -0,0 +1,57 @@
+"""
+Offline benchmarks run with `python manage.py benchmark`.
+
+Result pages of every site are saved under pages/ so scrapers can be measured
+without touching the live sites. Pages in the scrapers' HTTP cache are replayed too.
+"""
+import os
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from product_hunt.scrapers.httpcache import get_http_cache
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'pages')
+
+
+def page_path(website_name):
+    return os.path.join(PAGES_DIR, f"{website_name.lower()}.html")
+
+
+def load_page(website_name):
+    """
+    Returns the saved search results page of the given website.
+    """
+    with open(page_path(website_name), encoding='utf-8') as f:
+        return f.read()
+
+
+def saved_scrapers():
+    """
+    Returns the scraper classes of the sites that have a saved results page.
+    """
+    from product_hunt.scrapers.engine import SCRAPERS
+    return [Scraper for Scraper in SCRAPERS if os.path.exists(page_path(Scraper.website_name))]
+
+
+def cached_pages(home_url):
+    """
+    Returns the HTML of the pages of the given site found in the scrapers' HTTP cache.
+    """
+    cache = get_http_cache(getattr(settings, 'SCRAPER_HTTP_CACHE_DIR', None))
+    if cache is None:
+        return []
+    host = urlsplit(home_url).netloc.lower()
+    return [cached.text for cached in cache.responses() if urlsplit(cached.url).netloc.lower() == host]
+
+
+def measure(func, repeat=5, number=1):
+    """
+    Runs func `number` times per round and returns the best round time per call, in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
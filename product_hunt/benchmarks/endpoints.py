@@ -0,0 +1,137 @@
+import logging
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from product_hunt.apicache import invalidate_all
+from product_hunt.models import Keyword, Product, Website
+
+ROWS = (1000, 100000, 1000000)
+REQUESTS = 50
+INSERT_BATCH = 10000
+
+# Keywords and name tokens repeat every DISTINCT rows, so every query matches
+# rows / DISTINCT products whatever the table size.
+DISTINCT = 1000
+
+ENDPOINTS = [
+    ('get_keyword_data', 'keyword', 'benchkw{:04d}'),
+    ('search_products', 'query', 'benchname{:04d}'),
+]
+
+
+def create_keywords():
+    """
+    Creates the DISTINCT synthetic keywords and returns their ids by number.
+    """
+    keywords = Keyword.objects.bulk_create([
+        Keyword(name=f"benchkw{index:04d}") for index in range(DISTINCT)
+    ])
+    return [keyword.id for keyword in keywords]
+
+
+def create_products(start, stop, websites, keyword_ids):
+    """
+    Inserts the synthetic products numbered start to stop - 1, in batches, each
+    linked to its keyword.
+    """
+    now = timezone.now()
+    Link = Product.keywords.through
+    for batch_start in range(start, stop, INSERT_BATCH):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"Benchmark product benchname{index % DISTINCT:04d} model {index}",
+                price=f"${index % 500}.99",
+                price_value=Decimal(f"{index % 500}.99"),
+                reviews=f"{index % 5}.0 out of 5 stars",
+                product_url=f"https://bench.example.com/product/{index}",
+                product_key=f"https://bench.example.com/product/{index}",
+                image_url=f"https://bench.example.com/image/{index}.jpg",
+                website=websites[index % len(websites)],
+                sentiment_score=(index % 100) / 100,
+                sentiment_label='Positive',
+                keyword=f"benchkw{index % DISTINCT:04d}",
+                scraped_at=now,
+            )
+            for index in range(batch_start, min(batch_start + INSERT_BATCH, stop))
+        ], batch_size=1000)
+        Link.objects.bulk_create([
+            Link(product_id=product.id, keyword_id=keyword_ids[index % DISTINCT])
+            for index, product in enumerate(products, batch_start)
+        ], batch_size=1000)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[round(fraction * (len(samples) - 1))]
+
+
+def latencies(client, path, param, values, cold):
+    """
+    Requests the endpoint once per value and returns the latencies in milliseconds.
+
+    With cold=True the response cache is invalidated before every request, so each
+    one runs the query and serialization.
+    """
+    samples = []
+    for value in values:
+        if cold:
+            invalidate_all()
+        started = time.perf_counter()
+        response = client.get(path, {param: value})
+        samples.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code} for {param}={value}")
+    return samples
+
+
+def run(repeat=5, rows=ROWS):
+    """
+    Measures the p50/p95 latency of get_keyword_data and search_products through the
+    full request stack, with the products table grown to each size in `rows`.
+
+    Every size is measured with the response cache invalidated before each request
+    (cold) and with every response already cached. The products are created in a
+    transaction that is rolled back afterwards.
+    """
+    results = []
+    client = Client()
+    # Per-request INFO logging would be measured too.
+    logging.disable(logging.INFO)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            websites = [
+                Website.objects.get_or_create(name=f"Benchmark {index}", defaults={'url': f"https://bench{index}.example.com/"})[0]
+                for index in range(3)
+            ]
+            keyword_ids = create_keywords()
+            created = 0
+            for size in sorted(rows):
+                create_products(created, size, websites, keyword_ids)
+                created = size
+                for endpoint, param, template in ENDPOINTS:
+                    path = reverse(endpoint)
+                    values = [template.format(index % min(size, DISTINCT)) for index in range(REQUESTS)]
+                    for cache in ('cold', 'cached'):
+                        samples = []
+                        for _ in range(repeat):
+                            if cache == 'cached':
+                                latencies(client, path, param, values, cold=False)
+                            samples += latencies(client, path, param, values, cold=cache == 'cold')
+                        results.append({
+                            'benchmark': 'endpoints',
+                            'endpoint': endpoint,
+                            'cache': cache,
+                            'rows': size,
+                            'requests': len(samples),
+                            'p50_ms': round(percentile(samples, 0.5), 2),
+                            'p95_ms': round(percentile(samples, 0.95), 2),
+                        })
+            invalidate_all()
+            transaction.set_rollback(True)
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
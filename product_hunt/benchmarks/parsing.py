@@ -0,0 +1,67 @@
+import re
+from bs4 import BeautifulSoup
+from . import cached_pages, load_page, measure, saved_scrapers
+
+
+def legacy_extract(scraper, html_text):
+    """
+    The pre-lxml extraction path: html.parser soup and two select_one calls per field.
+    Field patterns are not applied.
+    """
+    soup = BeautifulSoup(html_text, 'html.parser')
+    product_data = []
+    for item in soup.select(scraper.ITEM_SELECTOR):
+        fields = {}
+        for name, field in scraper.get_selectors().fields:
+            selector, attr = field.selector, field.attr
+            if attr:
+                fields[name] = item.select_one(selector).get(attr) if item.select_one(selector) else None
+            else:
+                fields[name] = item.select_one(selector).text if item.select_one(selector) else None
+        if fields['price']:
+            fields['price'] = re.sub(r'[^\d$.]+', '', fields['price'])
+        product_data.append(fields)
+    next_page = soup.select_one(scraper.NEXT_PAGE_SELECTOR)
+    return product_data, next_page.get('href') if next_page else None
+
+
+def compiled_extract(scraper, html_text):
+    """
+    The current extraction path: lxml tree and precompiled selectors.
+    """
+    root = scraper.parse_html(html_text)
+    items = [scraper.extract_fields(item) for item in scraper.get_selectors().items(root)]
+    return items, scraper.get_next_page_url(root)
+
+
+def run(repeat=5):
+    """
+    Compares items/sec of the legacy and compiled extraction paths on the saved pages,
+    and on the pages replayed from the HTTP cache when there are any.
+
+    Sentiment scoring is left out so only HTML parsing and field extraction are measured.
+    """
+    results = []
+    for Scraper in saved_scrapers():
+        scraper = Scraper.for_keyword('laptop')
+        sources = [('saved', [load_page(Scraper.website_name)])]
+        replayed = cached_pages(Scraper.HOME_URL)
+        if replayed:
+            sources.append(('cache', replayed))
+        for source, pages in sources:
+            items = sum(len(compiled_extract(scraper, html_text)[0]) for html_text in pages)
+            if not items:
+                continue
+            legacy = measure(lambda: [legacy_extract(scraper, html_text) for html_text in pages], repeat)
+            compiled = measure(lambda: [compiled_extract(scraper, html_text) for html_text in pages], repeat)
+            results.append({
+                'benchmark': 'parsing',
+                'site': Scraper.website_name,
+                'source': source,
+                'pages': len(pages),
+                'items': items,
+                'legacy_items_per_sec': round(items / legacy, 1),
+                'items_per_sec': round(items / compiled, 1),
+                'speedup': round(legacy / compiled, 2),
+            })
+    return results
@@ -0,0 +1,93 @@
+import itertools
+from django.db import transaction
+from product_hunt.models import Product
+from . import measure, saved_scrapers
+from .stub import StubServer, stub_scraper
+
+SAVE_ROWS = 5000
+FETCHES = 20
+
+
+def rows_for_save(product_data, rows=SAVE_ROWS, offset=0):
+    """
+    Repeats the scraped products up to `rows` dicts, each with its own product URL and key.
+    """
+    return [
+        dict(
+            product,
+            product_url=f"{product['product_url']}#bench{offset + index}",
+            product_key=f"{product['product_key']}#bench{offset + index}",
+        )
+        for index, product in zip(range(rows), itertools.cycle(product_data))
+    ]
+
+
+def run(repeat=5):
+    """
+    Measures every stage of scraping one results page per site against the saved pages
+    served by a local stub server: fetch_html (over a real HTTP connection), parse_html,
+    each field extractor, the whole scrape_page, and save_to_database for new rows
+    (insert), for rows already stored (upsert) and for unchanged rows, which are only
+    touched (unchanged).
+
+    Saved rows are written in a transaction that is rolled back afterwards.
+    """
+    results = []
+    scrapers = saved_scrapers()
+    with StubServer([Scraper.website_name for Scraper in scrapers]) as server:
+        for Scraper in scrapers:
+            scraper = stub_scraper(Scraper, server).for_keyword('laptop')
+            url = scraper.base_url
+            html_text = scraper.fetch_html(url)
+            root = scraper.parse_html(html_text)
+            selectors = scraper.get_selectors()
+            items = selectors.items(root) if root is not None else []
+            if not items:
+                continue
+            site = {'site': Scraper.website_name, 'items': len(items)}
+
+            seconds = measure(lambda: scraper.fetch_html(url), repeat, number=FETCHES)
+            results.append({'benchmark': 'scraping', 'stage': 'fetch_html', **site, 'us_per_fetch': round(seconds * 1e6, 1)})
+
+            seconds = measure(lambda: scraper.parse_html(html_text), repeat)
+            results.append({'benchmark': 'scraping', 'stage': 'parse_html', **site, 'pages_per_sec': round(1 / seconds, 1)})
+
+            extractors = [('items', lambda: selectors.items(root), 1)]
+            extractors += [(name, lambda selector=selector: [selector(item) for item in items], len(items)) for name, selector in selectors.fields]
+            if selectors.next_page is not None:
+                extractors.append(('next_page', lambda: selectors.next_page_url(root), 1))
+            for name, func, calls in extractors:
+                seconds = measure(func, repeat)
+                results.append({
+                    'benchmark': 'scraping',
+                    'stage': 'extract',
+                    **site,
+                    'extractor': name,
+                    'us_per_call': round(seconds / calls * 1e6, 2),
+                })
+
+            product_data, _ = scraper.scrape_page(url)
+            seconds = measure(lambda: scraper.scrape_page(url), repeat)
+            results.append({'benchmark': 'scraping', 'stage': 'scrape_page', **site, 'items_per_sec': round(len(product_data) / seconds, 1)})
+
+            # Like a scrape, only complete rows are saved.
+            product_data = scraper.drop_placeholder_rows(product_data)
+            if not product_data:
+                continue
+            with transaction.atomic():
+                keyword = 'benchmark scraping'
+                # Every insert round writes rows that are not stored yet.
+                batches = iter([rows_for_save(product_data, offset=SAVE_ROWS * index) for index in range(repeat)])
+                seconds = measure(lambda: scraper.save_to_database(next(batches), keyword), repeat)
+                results.append({'benchmark': 'scraping', 'stage': 'save_insert', **site, 'rows': SAVE_ROWS, 'rows_per_sec': round(SAVE_ROWS / seconds)})
+                rows = rows_for_save(product_data)
+                seconds = measure(lambda: scraper.save_to_database(rows, keyword), repeat)
+                results.append({'benchmark': 'scraping', 'stage': 'save_upsert', **site, 'rows': SAVE_ROWS, 'rows_per_sec': round(SAVE_ROWS / seconds)})
+                # A re-scrape of the same, unchanged rows only updates scraped_at.
+                rows = [dict(row, unchanged=True) for row in rows]
+                seconds = measure(lambda: scraper.save_to_database(rows, keyword), repeat)
+                results.append({'benchmark': 'scraping', 'stage': 'save_unchanged', **site, 'rows': SAVE_ROWS, 'rows_per_sec': round(SAVE_ROWS / seconds)})
+                if Product.objects.filter(keyword=keyword).count() < SAVE_ROWS:
+                    raise RuntimeError("save_to_database() did not write the benchmark rows")
+                transaction.set_rollback(True)
+    return results
@@ -0,0 +1,37 @@
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from product_hunt.scrapers import utils
+from . import load_page, measure, saved_scrapers
+
+
+def saved_reviews():
+    """
+    Returns the reviews texts found on all saved result pages.
+    """
+    reviews = []
+    for Scraper in saved_scrapers():
+        scraper = Scraper.for_keyword('laptop')
+        root = scraper.parse_html(load_page(Scraper.website_name))
+        reviews.extend(scraper.extract_fields(item)['reviews'] for item in scraper.get_selectors().items(root))
+    return [review for review in reviews if review]
+
+
+def run(repeat=5):
+    """
+    Measures the per-review cost of VADER scoring: a new analyzer per review (the
+    old behaviour), the shared analyzer, and the batch API.
+    """
+    reviews = saved_reviews()
+    candidates = {
+        'analyzer_per_review': lambda: [SentimentIntensityAnalyzer().polarity_scores(review) for review in reviews],
+        'shared_analyzer': lambda: [utils.sentiment_score(review) for review in reviews],
+        'batch': lambda: utils.sentiment_scores(reviews),
+    }
+    return [
+        {
+            'benchmark': 'sentiment',
+            'variant': variant,
+            'reviews': len(reviews),
+            'us_per_review': round(measure(func, repeat) / len(reviews) * 1e6, 1),
+        }
+        for variant, func in candidates.items()
+    ]
@@ -0,0 +1,68 @@
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from product_hunt.models import Product, Website
+from product_hunt.serializers import ProductSerializer, serialize_products
+from . import measure
+
+ROWS = 10000
+
+
+def create_products(rows=ROWS):
+    """
+    Inserts `rows` synthetic products spread over three websites.
+    """
+    websites = [
+        Website.objects.get_or_create(name=f"Benchmark {index}", defaults={'url': f"https://bench{index}.example.com/"})[0]
+        for index in range(3)
+    ]
+    now = timezone.now()
+    Product.objects.bulk_create([
+        Product(
+            name=f"Benchmark product {index}",
+            price=f"${index % 500}.99",
+            price_value=Decimal(f"{index % 500}.99"),
+            reviews=f"{index % 5}.0 out of 5 stars",
+            product_url=f"https://bench.example.com/product/{index}",
+            product_key=f"https://bench.example.com/product/{index}",
+            image_url=f"https://bench.example.com/image/{index}.jpg",
+            website=websites[index % len(websites)],
+            sentiment_score=(index % 100) / 100,
+            sentiment_label='Positive',
+            keyword='benchmark serialization',
+            scraped_at=now,
+        )
+        for index in range(rows)
+    ], batch_size=1000)
+
+
+def run(repeat=5):
+    """
+    Compares rows/sec of serializing ROWS products, including their query: the
+    ModelSerializer with a website query per row, the ModelSerializer with
+    select_related('website'), and the values()-based fast path.
+
+    The products are created in a transaction that is rolled back afterwards.
+    """
+    with transaction.atomic():
+        create_products()
+        products = Product.objects.filter(keyword='benchmark serialization').order_by('id')
+        expected = ProductSerializer(products.select_related('website'), many=True).data
+        if serialize_products(products) != expected:
+            raise RuntimeError("serialize_products() no longer matches ProductSerializer")
+        candidates = {
+            'model_serializer': lambda: ProductSerializer(products.all(), many=True).data,
+            'model_serializer_select_related': lambda: ProductSerializer(products.select_related('website'), many=True).data,
+            'values': lambda: serialize_products(products),
+        }
+        results = [
+            {
+                'benchmark': 'serialization',
+                'variant': variant,
+                'rows': ROWS,
+                'rows_per_sec': round(ROWS / measure(func, repeat)),
+            }
+            for variant, func in candidates.items()
+        ]
+        transaction.set_rollback(True)
+    return results
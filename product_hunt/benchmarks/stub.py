@@ -0,0 +1,78 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from . import load_page
+
+
+class StubServer:
+    """
+    Serves the saved result pages on localhost, standing in for the live sites.
+
+    Any path under /<website name>/ returns that site's saved page, so scrapers built
+    with stub_scraper() go through the same session, fetch and parse code as against
+    the live site. Use it as a context manager.
+    """
+
+    def __init__(self, website_names, delay=0.0):
+        """
+        Parameters:
+            website_names (list): Sites whose saved pages are served.
+            delay (float, optional): Seconds to wait before answering, to simulate latency.
+        """
+        self.pages = {name.lower(): load_page(name).encode('utf-8') for name in website_names}
+        self.delay = delay
+        self.server = None
+
+    def __enter__(self):
+        pages, delay = self.pages, self.delay
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = pages.get(self.path.strip('/').split('/')[0].lower())
+                if delay:
+                    time.sleep(delay)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def home_url(self, website_name):
+        return f"{self.url}/{website_name.lower()}/"
+
+
+def stub_scraper(Scraper, server):
+    """
+    Returns a subclass of the scraper that talks to the stub server.
+
+    The subclass is not rate limited and bypasses the HTTP cache, so every fetch is
+    a real request to the stub.
+    """
+    home_url = server.home_url(Scraper.website_name)
+    return type(f"Stub{Scraper.__name__}", (Scraper,), {
+        'HOME_URL': home_url,
+        'SEARCH_URL': home_url + 'search?q={keyword}',
+        'get_rate_limit': lambda self: 1e9,
+        'get_http_cache': lambda self: None,
+    })
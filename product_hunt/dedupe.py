@@ -0,0 +1,104 @@
+"""
+Canonical products: one row per (website, product_key), linked to every keyword it
+was found for.
+
+Products saved before product keys existed were stored once per URL, and the same
+product often appears under several URLs (tracking parameters, slugs, sponsored
+links). Migration 0011 merged them with a frozen copy of these functions;
+`manage.py dedupe_products` runs them again, e.g. after a site's `product_id`
+pattern changed.
+"""
+from collections import defaultdict
+from django.db import transaction
+from .scrapers.sites import product_key
+from .search import normalize_keyword
+
+BATCH_SIZE = 2000
+
+
+def link_product_keywords(Product, Keyword, batch_size=BATCH_SIZE):
+    """
+    Links every product to the normalized form of its `keyword` field.
+
+    Returns:
+        int: The number of products processed.
+    """
+    keywords = Product.objects.order_by().values_list('keyword', flat=True).distinct()
+    names = {keyword: normalize_keyword(keyword) for keyword in keywords}
+    Keyword.objects.bulk_create(
+        [Keyword(name=name) for name in set(names.values()) if name], batch_size=batch_size, ignore_conflicts=True
+    )
+    keyword_ids = dict(Keyword.objects.values_list('name', 'id'))
+    Link = Product.keywords.through
+    links = []
+    count = 0
+    for product_id, keyword in Product.objects.order_by().values_list('id', 'keyword').iterator(chunk_size=batch_size):
+        count += 1
+        keyword_id = keyword_ids.get(names[keyword])
+        if keyword_id is not None:
+            links.append(Link(product_id=product_id, keyword_id=keyword_id))
+        if len(links) >= batch_size:
+            Link.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    Link.objects.bulk_create(links, ignore_conflicts=True)
+    return count
+
+
+def merge_duplicate_products(Product, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Recomputes the product key of every product and merges the products of a website
+    that share a key.
+
+    The most recently scraped row of each key is kept (the newest one when none was
+    scraped); the keyword links of the others are moved to it before they are deleted.
+
+    Parameters:
+        Product (type): The Product model.
+        dry_run (bool, optional): Only count what would change. Defaults to False.
+
+    Returns:
+        tuple: The number of rows whose key changed and the number of rows merged away.
+    """
+    groups = defaultdict(list)
+    rows = Product.objects.order_by().values_list(
+        'id', 'website_id', 'website__name', 'product_url', 'product_key', 'scraped_at'
+    )
+    for product_id, website_id, website_name, url, key, scraped_at in rows.iterator(chunk_size=batch_size):
+        groups[(website_id, product_key(website_name, url) or url)].append((scraped_at, product_id, key))
+
+    new_keys = {}
+    duplicates = {}
+    for (website_id, key), group in groups.items():
+        group.sort(key=lambda row: (row[0] is not None, row[0], row[1]))
+        *older, (_, keep_id, old_key) = group
+        for _, product_id, _ in older:
+            duplicates[product_id] = keep_id
+        if old_key != key:
+            new_keys[keep_id] = key
+    if dry_run:
+        return len(new_keys), len(duplicates)
+
+    Link = Product.keywords.through
+    with transaction.atomic():
+        duplicate_ids = list(duplicates)
+        for start in range(0, len(duplicate_ids), batch_size):
+            batch = duplicate_ids[start:start + batch_size]
+            links = Link.objects.filter(product_id__in=batch).values_list('product_id', 'keyword_id')
+            Link.objects.bulk_create(
+                [Link(product_id=duplicates[product_id], keyword_id=keyword_id) for product_id, keyword_id in links],
+                ignore_conflicts=True,
+            )
+            Product.objects.filter(id__in=batch).delete()
+        # Keys are first set to a unique placeholder, so a new key never collides with
+        # the old key of a row that is updated later.
+        changed = list(new_keys.items())
+        for placeholder in (True, False):
+            for start in range(0, len(changed), batch_size):
+                Product.objects.bulk_update(
+                    [
+                        Product(id=product_id, product_key=f"~{product_id}" if placeholder else key)
+                        for product_id, key in changed[start:start + batch_size]
+                    ],
+                    ['product_key'],
+                )
+    return len(new_keys), len(duplicates)
@@ -0,0 +1,275 @@
+"""
+Database-backed queue of scrape jobs.
+
+scrape_and_store enqueues a ScrapeJob and returns immediately; workers started with
+`manage.py scrape_worker` (or the in-process workers of the web server, see
+SCRAPE_WORKER_THREADS) claim pending jobs and run them with the ScrapeEngine. No
+broker is needed: jobs are claimed with a conditional UPDATE, which is atomic on
+every database Django supports.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from .metrics import JOB_SECONDS, collect_stages
+from .models import ScrapeJob
+from .profiling import maybe_profile_job
+from .search import normalize_keyword
+from .scrapers.engine import SCRAPERS, ScrapeEngine, get_scrapers
+
+logger = logging.getLogger(__name__)
+
+
+def site_ttl(website_name):
+    """
+    Returns how many seconds stored products of the website stay fresh.
+    """
+    ttls = getattr(settings, 'SCRAPE_CACHE_TTLS', {})
+    return ttls.get(website_name, getattr(settings, 'SCRAPE_CACHE_TTL', 6 * 60 * 60))
+
+
+def stale_sites(keyword):
+    """
+    Returns the websites whose stored results for the keyword have outlived their TTL.
+
+    A site is fresh if a finished scrape job of the keyword covered it within the TTL.
+    Products are shared between keywords, so their scraped_at says nothing about when
+    this keyword was last scraped. Keywords stored without a job (e.g. by
+    `manage.py scrape_keywords`) count as stale until a job has refreshed them.
+
+    Parameters:
+        keyword (str): The search keyword.
+
+    Returns:
+        list: Website names to refresh, empty if everything is fresh.
+    """
+    now = timezone.now()
+    names = [Scraper.website_name for Scraper in SCRAPERS]
+    ttls = {name: timedelta(seconds=site_ttl(name)) for name in names}
+    jobs = (
+        ScrapeJob.objects.filter(
+            normalized_keyword=normalize_keyword(keyword),
+            status=ScrapeJob.DONE,
+            finished_at__gte=now - max(ttls.values()),
+        )
+        .order_by('-finished_at')
+        .values_list('sites', 'finished_at')
+    )
+    last_scraped = {}
+    for sites, finished_at in jobs.iterator():
+        for name in sites or names:
+            last_scraped.setdefault(name, finished_at)
+        if len(last_scraped) >= len(names):
+            break
+    return [
+        name for name in names
+        if name not in last_scraped or now - last_scraped[name] > ttls[name]
+    ]
+
+
+def enqueue_scrape(keyword, sites=None):
+    """
+    Queues a scrape of the keyword, or joins the scrape already queued or running for it.
+
+    Requests for the same normalized keyword coalesce into one job (single flight): the
+    unique constraint on active jobs makes a concurrent second insert fail, and that
+    caller attaches to the winner's job instead.
+
+    Parameters:
+        keyword (str): The search keyword.
+        sites (list, optional): Website names to scrape. Defaults to all sites.
+
+    Returns:
+        ScrapeJob: The pending or running job for the keyword.
+    """
+    normalized = normalize_keyword(keyword)
+    active = ScrapeJob.objects.filter(
+        normalized_keyword=normalized, status__in=[ScrapeJob.PENDING, ScrapeJob.RUNNING]
+    )
+    while True:
+        job = active.first()
+        if job is not None:
+            logger.info(f"Joined scrape job {job.id} for keyword: {keyword}")
+            return job
+        try:
+            with transaction.atomic():
+                job = ScrapeJob.objects.create(keyword=keyword, normalized_keyword=normalized, sites=sites or [])
+        except IntegrityError:
+            # Another request queued the keyword in the meantime; join its job.
+            continue
+        logger.info(f"Queued scrape job {job.id} for keyword: {keyword}")
+        return job
+
+
+def claim_next_job(worker):
+    """
+    Marks the oldest pending job as running for the given worker.
+
+    Parameters:
+        worker (str): Identifier of the claiming worker.
+
+    Returns:
+        ScrapeJob or None: The claimed job, or None if the queue is empty.
+    """
+    while True:
+        job_id = (
+            ScrapeJob.objects.filter(status=ScrapeJob.PENDING)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = ScrapeJob.objects.filter(id=job_id, status=ScrapeJob.PENDING).update(
+            status=ScrapeJob.RUNNING, started_at=timezone.now(), worker=worker
+        )
+        if claimed:
+            return ScrapeJob.objects.get(id=job_id)
+        # Another worker claimed it first, try the next one.
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    Puts jobs back in the queue whose worker died while running them.
+
+    Parameters:
+        timeout (float, optional): Seconds after which a running job counts as stale.
+            Defaults to SCRAPE_JOB_TIMEOUT.
+
+    Returns:
+        int: The number of requeued jobs.
+    """
+    timeout = timeout or getattr(settings, 'SCRAPE_JOB_TIMEOUT', 600)
+    return ScrapeJob.objects.filter(
+        status=ScrapeJob.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status=ScrapeJob.PENDING, started_at=None, worker='')
+
+
+def run_job(job):
+    """
+    Scrapes the job's keyword on its sites and records the outcome on the job.
+
+    The job's stats keep the engine's page and item counts and the time spent in each
+    scrape stage per site. Jobs picked by PROFILING_JOB_SAMPLE_RATE are also profiled.
+    """
+    logger.info(f"Running scrape job {job.id} for keyword: {job.keyword}")
+    engine = ScrapeEngine(scrapers=get_scrapers(job.sites))
+    started = time.monotonic()
+    with collect_stages() as stages:
+        try:
+            with maybe_profile_job(job.keyword) as profile:
+                if profile is not None:
+                    profile.info['job_id'] = job.id
+                results = asyncio.run(engine.scrape_keyword(job.keyword))
+            job.products_count = sum(
+                len({product['product_url'] for product in products}) for products in results.values()
+            )
+            job.status = ScrapeJob.DONE if job.products_count else ScrapeJob.FAILED
+            job.error = '' if job.products_count else 'Failed to scrape data'
+        except Exception as e:
+            logger.error(f"Scrape job {job.id} failed: {str(e)}")
+            job.status = ScrapeJob.FAILED
+            job.error = str(e)
+    seconds = time.monotonic() - started
+    job.stats = dict(engine.stats, seconds=round(seconds, 3), stages=stages.summary())
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'products_count', 'error', 'stats', 'finished_at'])
+    JOB_SECONDS.observe(seconds, status=job.status)
+    return job
+
+
+def worker_loop(worker, poll_interval=1.0, stop_event=None, once=False):
+    """
+    Claims and runs jobs until stopped.
+
+    Parameters:
+        worker (str): Identifier of this worker.
+        poll_interval (float, optional): Seconds to sleep when the queue is empty.
+        stop_event (threading.Event, optional): Stops the loop when set.
+        once (bool, optional): Return as soon as the queue is empty.
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_next_job(worker)
+        except Exception as e:
+            logger.error(f"Worker {worker} could not claim a job: {str(e)}")
+            job = None
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job)
+    close_old_connections()
+
+
+def start_workers(count, poll_interval=1.0, once=False, daemon=False):
+    """
+    Starts worker threads.
+
+    Returns:
+        tuple: The list of threads and the threading.Event that stops them.
+    """
+    stop_event = threading.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f"{prefix}:{index}",),
+            kwargs={'poll_interval': poll_interval, 'stop_event': stop_event, 'once': once},
+            name=f"scrape-worker-{index}",
+            daemon=daemon,
+        )
+        for index in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads, stop_event
+
+
+_in_process_workers = None
+_in_process_lock = threading.Lock()
+
+
+def ensure_in_process_workers():
+    """
+    Starts SCRAPE_WORKER_THREADS daemon workers inside this process, once.
+
+    Lets a single `runserver` process execute the jobs it enqueues; set the setting to
+    0 when dedicated `manage.py scrape_worker` processes are running.
+    """
+    global _in_process_workers
+    count = getattr(settings, 'SCRAPE_WORKER_THREADS', 0)
+    if not count or _in_process_workers is not None:
+        return
+    with _in_process_lock:
+        if _in_process_workers is None:
+            requeue_stale_jobs()
+            _in_process_workers = start_workers(count, daemon=True)
+
+
+def wait_for_job(job, timeout):
+    """
+    Long-polls a job until it finishes or the timeout expires.
+
+    Parameters:
+        job (ScrapeJob): The job to watch; it is refreshed in place.
+        timeout (float): Maximum seconds to wait.
+
+    Returns:
+        ScrapeJob: The refreshed job.
+    """
+    deadline = time.monotonic() + timeout
+    interval = getattr(settings, 'SCRAPE_JOB_POLL_INTERVAL', 0.5)
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,87 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from product_hunt.benchmarks import endpoints, parsing, scraping, sentiment, serialization
+
+SUITES = {
+    'parsing': parsing.run,
+    'sentiment': sentiment.run,
+    'serialization': serialization.run,
+    'scraping': scraping.run,
+    'endpoints': endpoints.run,
+}
+
+# Metrics compared by --compare, and whether a higher value is better.
+METRIC_SUFFIXES = {'_per_sec': True, '_ms': False}
+METRIC_PREFIXES = {'us_per_': False}
+
+
+def metric_direction(key):
+    for suffix, higher_is_better in METRIC_SUFFIXES.items():
+        if key.endswith(suffix):
+            return higher_is_better
+    for prefix, higher_is_better in METRIC_PREFIXES.items():
+        if key.startswith(prefix):
+            return higher_is_better
+    return None
+
+
+def result_id(result):
+    """
+    Identifies a result across runs by its string fields and table size.
+    """
+    return tuple(sorted((key, value) for key, value in result.items() if isinstance(value, str) or key == 'rows'))
+
+
+class Command(BaseCommand):
+    help = "Runs the offline benchmarks against the saved result pages and synthetic products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', help=f"Suites to run: {', '.join(SUITES)} (default: all).")
+        parser.add_argument('--repeat', type=int, default=5, help="Rounds per measurement; the best one is reported.")
+        parser.add_argument('--rows', type=int, nargs='+', help="Table sizes of the endpoints suite (default: 1000 100000 1000000).")
+        parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file.")
+        parser.add_argument('--compare', dest='baseline_path', help="Print the change of every metric against this earlier --json file.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['suites']) - set(SUITES)
+        if unknown:
+            raise CommandError(f"Unknown benchmark suites: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline_path']:
+            try:
+                with open(options['baseline_path']) as f:
+                    baseline = {result_id(result): result for result in json.load(f)}
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline_path']}: {e}")
+        results = []
+        for name in options['suites'] or SUITES:
+            kwargs = {'repeat': options['repeat']}
+            if name == 'endpoints' and options['rows']:
+                kwargs['rows'] = options['rows']
+            for result in SUITES[name](**kwargs):
+                results.append(result)
+                self.stdout.write(' '.join(f"{key}={value}" for key, value in result.items()))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if baseline is not None:
+            self.compare(results, baseline)
+
+    def compare(self, results, baseline):
+        """
+        Prints the relative change of each metric, flagging the ones that got worse.
+        """
+        self.stdout.write(f"Compared with {len(baseline)} baseline results:")
+        for result in results:
+            previous = baseline.get(result_id(result))
+            if previous is None:
+                continue
+            label = ' '.join(str(value) for key, value in result.items() if isinstance(value, str) or key == 'rows')
+            for key, value in result.items():
+                higher_is_better = metric_direction(key)
+                if higher_is_better is None or not previous.get(key):
+                    continue
+                change = (value - previous[key]) / previous[key] * 100
+                worse = change < 0 if higher_is_better else change > 0
+                line = f"{label} {key}: {previous[key]} -> {value} ({change:+.1f}%)"
+                self.stdout.write(self.style.WARNING(line) if worse else line)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from product_hunt.apicache import invalidate_all
+from product_hunt.dedupe import link_product_keywords, merge_duplicate_products
+from product_hunt.models import Keyword, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the product key of every stored product and merges the products of "
+        "a site stored more than once, e.g. after a site's product_id pattern changed. "
+        "The merged product keeps the keywords of all its duplicates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+        parser.add_argument(
+            '--link-keywords', action='store_true',
+            help="Also link every product to its keyword field, for rows written without the association.",
+        )
+
+    def handle(self, *args, **options):
+        if options['link_keywords'] and not options['dry_run']:
+            count = link_product_keywords(Product, Keyword)
+            self.stdout.write(f"Linked {count} products to their keyword")
+        rekeyed, merged = merge_duplicate_products(Product, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"Would update the key of {rekeyed} products and merge {merged} duplicates")
+            return
+        self.stdout.write(f"Updated the key of {rekeyed} products and merged {merged} duplicates")
+        if rekeyed or merged:
+            # Cached responses may list merged products.
+            invalidate_all()
@@ -0,0 +1,102 @@
+import glob
+import json
+import os
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from product_hunt.profiling import get_profile_dir
+
+
+def load_profiles(directory, kind=None, name=None):
+    """
+    Reads the JSON profiles of the directory, oldest first, keeping those matching
+    the kind and containing `name` in their name.
+    """
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if kind and profile.get('kind') != kind:
+            continue
+        if name and name not in profile.get('name', ''):
+            continue
+        profiles.append(profile)
+    return profiles
+
+
+class Command(BaseCommand):
+    help = "Summarizes the profiles written by the profiling middleware and scrape job hook."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Profile directory (default: PROFILING_DIR).")
+        parser.add_argument('--kind', choices=['request', 'job'], help="Only profiles of this kind.")
+        parser.add_argument('--name', help="Only profiles whose request path or keyword contains this.")
+        parser.add_argument('--limit', type=int, default=20, help="Rows per table.")
+        parser.add_argument('--sort', choices=['tottime', 'cumtime'], default='tottime', help="Hotspot ordering.")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or get_profile_dir()
+        if not os.path.isdir(directory):
+            raise CommandError(f"Profile directory not found: {directory}")
+        profiles = load_profiles(directory, options['kind'], options['name'])
+        if not profiles:
+            self.stdout.write("No profiles found")
+            return
+        limit = options['limit']
+        self.stdout.write(f"{len(profiles)} profiles in {directory}\n")
+
+        by_name = defaultdict(list)
+        for profile in profiles:
+            by_name[(profile['kind'], profile['name'])].append(profile)
+        self.stdout.write("Profiled requests and jobs:")
+        self.stdout.write(f"  {'count':>5} {'avg ms':>9} {'max ms':>9} {'queries':>8} {'sql ms':>8}  name")
+        rows = sorted(by_name.items(), key=lambda item: -sum(profile['seconds'] for profile in item[1]))
+        for (kind, name), group in rows[:limit]:
+            seconds = [profile['seconds'] for profile in group]
+            queries = sum(profile['sql']['count'] for profile in group) / len(group)
+            sql_seconds = sum(profile['sql']['seconds'] for profile in group) / len(group)
+            self.stdout.write(
+                f"  {len(group):>5} {sum(seconds) / len(group) * 1000:>9.1f} {max(seconds) * 1000:>9.1f} "
+                f"{queries:>8.1f} {sql_seconds * 1000:>8.1f}  {kind} {name}"
+            )
+
+        functions = defaultdict(lambda: {'tottime': 0.0, 'cumtime': 0.0, 'profiles': 0})
+        for profile in profiles:
+            for function in profile.get('functions', []):
+                totals = functions[function['function']]
+                totals['tottime'] += function['tottime']
+                totals['cumtime'] += function['cumtime']
+                totals['profiles'] += 1
+        self.stdout.write(f"\nTop functions by {options['sort']} (seconds summed over profiles):")
+        self.stdout.write(f"  {'tottime':>9} {'cumtime':>9} {'in':>5}  function")
+        for label, totals in sorted(functions.items(), key=lambda item: -item[1][options['sort']])[:limit]:
+            self.stdout.write(f"  {totals['tottime']:>9.3f} {totals['cumtime']:>9.3f} {totals['profiles']:>5}  {label}")
+
+        queries = defaultdict(lambda: {'count': 0, 'seconds': 0.0})
+        for profile in profiles:
+            for query in profile['sql'].get('slowest', []):
+                queries[query['sql']]['count'] += query['count']
+                queries[query['sql']]['seconds'] += query['seconds']
+        if queries:
+            self.stdout.write("\nSlowest SQL statements:")
+            self.stdout.write(f"  {'count':>6} {'total ms':>9}  statement")
+            for sql, totals in sorted(queries.items(), key=lambda item: -item[1]['seconds'])[:limit]:
+                statement = ' '.join(sql.split())
+                self.stdout.write(f"  {totals['count']:>6} {totals['seconds'] * 1000:>9.1f}  {statement[:160]}")
+
+        stages = defaultdict(lambda: {'count': 0, 'seconds': 0.0})
+        for profile in profiles:
+            for site, site_stages in profile.get('stages', {}).items():
+                for stage, totals in site_stages.items():
+                    stages[(site, stage)]['count'] += totals['count']
+                    stages[(site, stage)]['seconds'] += totals['seconds']
+        if stages:
+            self.stdout.write("\nScrape stages:")
+            self.stdout.write(f"  {'count':>6} {'total s':>9} {'avg ms':>8}  site stage")
+            for (site, stage), totals in sorted(stages.items(), key=lambda item: -item[1]['seconds'])[:limit]:
+                self.stdout.write(
+                    f"  {totals['count']:>6} {totals['seconds']:>9.3f} "
+                    f"{totals['seconds'] / totals['count'] * 1000:>8.1f}  {site} {stage}"
+                )
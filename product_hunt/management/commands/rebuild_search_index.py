@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from product_hunt.search import ensure_search_index
+
+
+class Command(BaseCommand):
+    help = "Creates the full-text search index over product names and keywords and re-populates it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to index.")
+
+    def handle(self, *args, **options):
+        if not ensure_search_index(options['database'], rebuild=True):
+            raise CommandError("Full-text search is not supported on this database; searches use icontains.")
+        self.stdout.write("Search index is up to date.")
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from product_hunt.apicache import invalidate_all, invalidate_keywords
+from product_hunt.models import Product
+from product_hunt.scrapers.BaseScraper import linked_keywords
+from product_hunt.search import normalize_keyword
+from product_hunt.scrapers.utils import review_sentiments
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the stored sentiment score and label of products, e.g. after the "
+        "scoring model changed. Runs in batches so it can work alongside the web app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keyword', help="Only recompute products stored for this keyword.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Products scored and updated per batch.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.only('id', 'reviews').order_by('id')
+        if options['keyword']:
+            products = products.filter(keywords__name=normalize_keyword(options['keyword']))
+
+        batch_size = options['batch_size']
+        updated = 0
+        updated_ids = []
+        last_id = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for product, sentiment in zip(batch, review_sentiments([product.reviews for product in batch])):
+                product.sentiment_score = sentiment['sentiment_score']
+                product.sentiment_label = sentiment['sentiment_label'] or 'Neutral'
+            with transaction.atomic():
+                Product.objects.bulk_update(batch, ['sentiment_score', 'sentiment_label'])
+            updated += len(batch)
+            if options['keyword']:
+                updated_ids += [product.id for product in batch]
+            last_id = batch[-1].id
+            self.stdout.write(f"Recomputed sentiment of {updated} products")
+
+        # Cached API responses still carry the old scores.
+        if options['keyword']:
+            # The products may also be linked to other keywords.
+            invalidate_keywords(linked_keywords(updated_ids) | {options['keyword']})
+        else:
+            invalidate_all()
@@ -0,0 +1,30 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from product_hunt.scrapers.engine import ScrapeEngine, get_scrapers
+
+
+class Command(BaseCommand):
+    help = "Scrapes the given keywords on all sites concurrently and stores the products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('keywords', nargs='+', help="Keywords to search for.")
+        parser.add_argument('--sites', nargs='+', help="Website names to scrape (default: all).")
+        parser.add_argument('--max-pages', type=int, help="Results pages per site.")
+        parser.add_argument('--timeout', type=float, help="Seconds allowed per keyword.")
+        parser.add_argument('--dry-run', action='store_true', help="Scrape without saving to the database.")
+
+    def handle(self, *args, **options):
+        engine = ScrapeEngine(
+            scrapers=get_scrapers(options['sites']),
+            max_pages=options['max_pages'],
+            timeout=options['timeout'],
+        )
+        asyncio.run(self.scrape(engine, options['keywords'], save=not options['dry_run']))
+
+    async def scrape(self, engine, keywords, save):
+        for keyword in keywords:
+            started = time.monotonic()
+            results = await engine.scrape_keyword(keyword, save=save)
+            counts = ', '.join(f"{site}: {len(products)}" for site, products in results.items())
+            self.stdout.write(f"{keyword}: {counts} ({time.monotonic() - started:.1f}s)")
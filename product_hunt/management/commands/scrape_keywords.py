@@ -0,0 +1,209 @@
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from product_hunt.apicache import invalidate_keywords
+from product_hunt.scrapers.BaseScraper import link_keyword, linked_keywords, save_products, touch_products
+from product_hunt.scrapers.engine import ScrapeEngine, get_scrapers
+from product_hunt.search import normalize_keyword
+
+
+def read_keywords(path):
+    """
+    Reads one keyword per line, skipping blank lines, '#' comments and duplicates.
+    """
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        keywords = {}
+        for line in f:
+            keyword = line.strip()
+            if keyword and not keyword.startswith('#'):
+                keywords.setdefault(normalize_keyword(keyword), keyword)
+        return [keyword for normalized, keyword in keywords.items() if normalized]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class BatchWriter:
+    """
+    Collects the products of many keywords and upserts them in large transactions.
+
+    Products that did not change since they were stored are not rewritten; only their
+    scraped_at is updated. Every product is linked to all the keywords it was found
+    for. A keyword is appended to the state file only after the
+    transaction holding its products has committed, so a resumed sweep never skips
+    unsaved keywords. Keywords with failed pages or sites are saved but not recorded,
+    so the next run scrapes them again.
+    """
+
+    def __init__(self, scrapers, batch_size, state_path=None):
+        self.scrapers = {Scraper.website_name: Scraper.for_keyword('') for Scraper in scrapers}
+        self.websites = {}
+        self.batch_size = batch_size
+        self.state_path = state_path
+        self.products = {}
+        self.unchanged = {}
+        self.links = {}
+        self.keywords = []
+        self.completed = []
+        self.written = 0
+        self.failed = 0
+
+    def add(self, keyword, results, errors=None):
+        """
+        Queues the products of one keyword and writes the batch once it is full.
+
+        Parameters:
+            keyword (str): The search keyword.
+            results (dict): The scraped products per website name.
+            errors (Counter, optional): The keyword's failed pages and sites (see ScrapeEngine.scrape_keyword).
+        """
+        for website_name, product_data in results.items():
+            scraper = self.scrapers[website_name]
+            if website_name not in self.websites:
+                self.websites[website_name] = scraper.get_website()
+            website = self.websites[website_name]
+            changed, unchanged = scraper.split_unchanged(product_data)
+            products = scraper.build_products(changed, keyword, website)
+            for key, product in products.items():
+                # A product found for several keywords is written once; self.links keeps them all.
+                self.products[(website.id, key)] = product
+            self.unchanged.setdefault(website, set()).update(unchanged)
+            self.links.setdefault((website, keyword), set()).update(unchanged | products.keys())
+        self.keywords.append(keyword)
+        if errors and sum(errors.values()):
+            self.failed += 1
+        else:
+            self.completed.append(keyword)
+        if len(self.products) + sum(len(urls) for urls in self.unchanged.values()) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.products:
+            save_products(self.products.values())
+            self.written += len(self.products)
+        scraped_at = timezone.now()
+        for website, keys in self.unchanged.items():
+            touch_products(website, keys, scraped_at)
+        product_ids = set()
+        for (website, keyword), keys in self.links.items():
+            product_ids.update(link_keyword(website, keys, keyword))
+        # Products are shared between keywords: responses of all their keywords are stale.
+        invalidate_keywords(linked_keywords(product_ids) | set(self.keywords))
+        if self.state_path and self.completed:
+            with open(self.state_path, 'a', encoding='utf-8') as f:
+                f.writelines(f"{normalize_keyword(keyword)}\n" for keyword in self.completed)
+        self.products = {}
+        self.unchanged = {}
+        self.links = {}
+        self.keywords = []
+        self.completed = []
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrapes every keyword of a file (one per line, '-' for stdin) on all sites. "
+        "All keyword, site and page fetches share one scheduler, products are written in "
+        "large batches, and an interrupted sweep resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('keyword_file', help="File with one keyword per line, or '-' for stdin.")
+        parser.add_argument('--sites', nargs='+', help="Website names to scrape (default: all).")
+        parser.add_argument('--max-pages', type=int, help="Results pages per site.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Keywords scraped at the same time.")
+        parser.add_argument('--host-concurrency', type=int, help="Concurrent page requests per host.")
+        parser.add_argument('--timeout', type=float, help="Seconds allowed per keyword.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Products per write transaction.")
+        parser.add_argument('--state-file', help="Completed keywords are recorded here (default: <keyword_file>.done).")
+        parser.add_argument('--restart', action='store_true', help="Ignore the state file and scrape every keyword.")
+        parser.add_argument('--stats-interval', type=float, default=30, help="Seconds between progress lines.")
+
+    def handle(self, *args, **options):
+        path = options['keyword_file']
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f"Keyword file not found: {path}")
+        if path == '-' and not options['state_file']:
+            raise CommandError("--state-file is required when reading keywords from stdin")
+        state_path = options['state_file'] or f"{path}.done"
+        if options['restart'] and os.path.exists(state_path):
+            os.remove(state_path)
+
+        keywords = read_keywords(path)
+        done = set()
+        if os.path.exists(state_path):
+            with open(state_path, encoding='utf-8') as f:
+                done = {line.strip() for line in f if line.strip()}
+        todo = [keyword for keyword in keywords if normalize_keyword(keyword) not in done]
+        self.stdout.write(f"{len(todo)} of {len(keywords)} keywords to scrape, {len(keywords) - len(todo)} already done")
+        if not todo:
+            return
+
+        scrapers = get_scrapers(options['sites'])
+        if not scrapers:
+            raise CommandError("No scraper matches --sites")
+        engine = ScrapeEngine(
+            scrapers=scrapers,
+            max_pages=options['max_pages'],
+            host_concurrency=options['host_concurrency'],
+            timeout=options['timeout'],
+        )
+        writer = BatchWriter(scrapers, options['batch_size'], state_path)
+        self.keywords_done = 0
+        started = time.monotonic()
+        try:
+            asyncio.run(self.sweep(engine, writer, todo, options['concurrency'], options['stats_interval']))
+        finally:
+            writer.flush()
+            self.report(engine, writer, started, len(todo), final=True)
+
+    async def sweep(self, engine, writer, keywords, concurrency, stats_interval):
+        """
+        Scrapes the keywords with `concurrency` keywords in flight; every page request of
+        every keyword goes through the engine's per-host semaphores and rate limiters.
+        """
+        queue = asyncio.Queue()
+        for keyword in keywords:
+            queue.put_nowait(keyword)
+        add = sync_to_async(writer.add)
+        started = time.monotonic()
+
+        async def worker():
+            while True:
+                try:
+                    keyword = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                errors = Counter()
+                results = await engine.scrape_keyword(keyword, save=False, errors=errors)
+                await add(keyword, results, errors)
+                self.keywords_done += 1
+
+        async def progress():
+            while True:
+                await asyncio.sleep(stats_interval)
+                self.report(engine, writer, started, len(keywords))
+
+        reporter = asyncio.create_task(progress())
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            reporter.cancel()
+
+    def report(self, engine, writer, started, total, final=False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        stats = engine.stats
+        self.stdout.write(
+            f"{'Done' if final else 'Progress'}: {self.keywords_done}/{total} keywords, "
+            f"{stats['pages']} pages ({stats['pages'] / elapsed:.1f}/s), "
+            f"{stats['items']} items ({stats['items'] / elapsed:.1f}/s), "
+            f"{writer.written} products written, {stats['unchanged']} unchanged, "
+            f"{stats['page_errors']} page errors, {stats['site_errors']} site errors, "
+            f"{writer.failed} keywords to retry, "
+            f"{elapsed:.0f}s"
+        )
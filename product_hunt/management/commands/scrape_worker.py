@@ -0,0 +1,36 @@
+import signal
+from django.core.management.base import BaseCommand
+from product_hunt.jobs import requeue_stale_jobs, start_workers
+from product_hunt.metrics import start_metrics_server
+
+
+class Command(BaseCommand):
+    help = "Runs a pool of workers executing queued scrape jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Number of jobs run at the same time.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--metrics-port', type=int, help="Serve this process's Prometheus metrics on this port.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs")
+        if options['metrics_port']:
+            start_metrics_server(options['metrics_port'])
+            self.stdout.write(f"Serving metrics on port {options['metrics_port']}")
+        threads, stop_event = start_workers(
+            options['concurrency'], poll_interval=options['poll_interval'], once=options['once']
+        )
+        signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+        self.stdout.write(f"Started {len(threads)} scrape workers")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the running jobs finish...")
+            stop_event.set()
+            for thread in threads:
+                thread.join()
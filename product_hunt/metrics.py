@@ -0,0 +1,258 @@
+"""
+In-process scrape metrics, exported in the Prometheus text format.
+
+Scrapers time their stages (rate limit wait, fetch, parse, extract, sentiment,
+db_write) per site with timed(); every observation goes to the process-wide
+histograms served at /metrics and, while a scrape job runs inside
+collect_stages(), to that job's summary as well. Metrics live in the memory of the
+process that recorded them: `manage.py scrape_worker --metrics-port` serves the
+ones of a worker process.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing value per label combination.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(f"{self.name}_total", key, (), value) for key, value in values]
+
+
+class Histogram:
+    """
+    Counts observations in cumulative buckets per label combination, with their sum.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, (('le', _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), total))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+
+class Registry:
+    """
+    The metrics of this process, rendered together by render().
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'scraper_stage_seconds', "Time spent in each scrape stage, per site.", ['site', 'stage']
+)
+FETCHES = REGISTRY.counter(
+    'scraper_fetches', "Page fetches per site by outcome (ok, cached, not_modified, error).", ['site', 'outcome']
+)
+ITEMS = REGISTRY.counter('scraper_items', "Products parsed from results pages, per site.", ['site'])
+UNCHANGED_ITEMS = REGISTRY.counter(
+    'scraper_unchanged_items', "Parsed products whose fingerprint matched the stored one, per site.", ['site']
+)
+ROWS_WRITTEN = REGISTRY.counter('scraper_rows_written', "Products upserted into the database, per site.", ['site'])
+ERRORS = REGISTRY.counter('scraper_errors', "Errors per site and stage.", ['site', 'stage'])
+JOB_SECONDS = REGISTRY.histogram(
+    'scrape_job_seconds', "Duration of scrape jobs by final status.", ['status']
+)
+
+
+class StageStats:
+    """
+    The stage timings recorded while a scrape job (or a parser process task) runs.
+
+    Observations are passed on to the enclosing StageStats, if any, so a profile
+    around a job sees the same stages as the job's own summary.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.observations = []
+        self._lock = threading.Lock()
+
+    def add(self, site, stage, seconds):
+        with self._lock:
+            self.observations.append((site, stage, seconds))
+        if self.parent is not None:
+            self.parent.add(site, stage, seconds)
+
+    def summary(self):
+        """
+        Returns {site: {stage: {'count': n, 'seconds': total}}} of the observations.
+        """
+        summary = {}
+        with self._lock:
+            observations = list(self.observations)
+        for site, stage, seconds in observations:
+            totals = summary.setdefault(site, {}).setdefault(stage, {'count': 0, 'seconds': 0.0})
+            totals['count'] += 1
+            totals['seconds'] += seconds
+        for stages in summary.values():
+            for totals in stages.values():
+                totals['seconds'] = round(totals['seconds'], 4)
+        return summary
+
+
+# Copied into asyncio tasks and to_thread/sync_to_async calls, so every stage of a
+# job's scrape reaches the job's StageStats.
+_current_stats = ContextVar('scrape_stage_stats', default=None)
+
+
+@contextmanager
+def collect_stages():
+    """
+    Records the stage timings of everything run inside the block in a new StageStats.
+    """
+    stats = StageStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def observe_stage(site, stage, seconds):
+    STAGE_SECONDS.observe(seconds, site=site, stage=stage)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(site, stage, seconds)
+
+
+@contextmanager
+def timed(site, stage):
+    """
+    Times the block as one observation of the given site and stage.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(site, stage, time.perf_counter() - started)
+
+
+def start_metrics_server(port, address=''):
+    """
+    Serves REGISTRY.render() on the given port from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
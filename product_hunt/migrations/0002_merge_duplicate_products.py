@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-18 16:49
+
+from urllib.parse import urlsplit, urlunsplit
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merges websites with the same name and keeps only the newest row per
+    (website, product_url, keyword), so the unique constraints of the next migration
+    can be created. The same product stored for several keywords keeps one row per
+    keyword.
+
+    Websites were created with the search URL they were first scraped from; their URL
+    is reduced to the site's home page.
+    """
+    Website = apps.get_model("product_hunt", "Website")
+    Product = apps.get_model("product_hunt", "Product")
+
+    for name in (
+        Website.objects.values("name")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+        .values_list("name", flat=True)
+    ):
+        websites = list(Website.objects.filter(name=name).order_by("id"))
+        keep, duplicates = websites[0], websites[1:]
+        Product.objects.filter(website__in=duplicates).update(website=keep)
+        Website.objects.filter(id__in=[website.id for website in duplicates]).delete()
+
+    for website in Website.objects.all():
+        parts = urlsplit(website.url)
+        home = urlunsplit((parts.scheme, parts.netloc, "/", "", ""))
+        if parts.netloc and website.url != home:
+            website.url = home
+            website.save(update_fields=["url"])
+
+    newest = (
+        Product.objects.values("website", "product_url", "keyword")
+        .annotate(newest_id=Max("id"), count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+    for row in newest:
+        Product.objects.filter(
+            website=row["website"], product_url=row["product_url"], keyword=row["keyword"]
+        ).exclude(id=row["newest_id"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product_hunt", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
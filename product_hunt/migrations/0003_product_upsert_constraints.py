@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product_hunt", "0002_merge_duplicate_products"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="website",
+            name="name",
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("website", "product_url", "keyword"), name="unique_website_product_url_keyword"
+            ),
+        ),
+    ]
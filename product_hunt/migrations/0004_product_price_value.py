@@ -0,0 +1,86 @@
+# Generated by Django 4.2 on 2026-10-18 16:52
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# Frozen copy of scrapers.utils.parse_price as of this migration, so later changes to
+# the scraper code do not change what it does.
+
+CURRENCY_SYMBOLS = {
+    "$": "USD",
+    "US $": "USD",
+    "C $": "CAD",
+    "AU $": "AUD",
+    "£": "GBP",
+    "€": "EUR",
+    "¥": "JPY",
+    "₹": "INR",
+}
+PRICE_RE = re.compile(r"(?P<symbol>(?:[A-Z]{1,2} ?)?[$£€¥₹]|[A-Z]{3})?\s*(?P<amount>\d[\d,]*(?:\.\d*)?|\.\d+)")
+
+
+def parse_price(text, default_currency="USD"):
+    match = PRICE_RE.search(text or "")
+    if not match:
+        return None, default_currency
+    symbol = (match.group("symbol") or "").strip()
+    currency = CURRENCY_SYMBOLS.get(symbol, symbol if len(symbol) == 3 and symbol.isalpha() else default_currency)
+    try:
+        amount = Decimal(match.group("amount").replace(",", "").rstrip(".") or "0")
+    except InvalidOperation:
+        return None, currency
+    return amount.quantize(Decimal("0.01")), currency
+
+
+def populate_price_value(apps, schema_editor):
+    """
+    Parses the stored price strings into price_value and currency.
+    """
+    Product = apps.get_model("product_hunt", "Product")
+    batch = []
+    for product in Product.objects.only("id", "price").iterator(chunk_size=1000):
+        product.price_value, product.currency = parse_price(product.price)
+        batch.append(product)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ["price_value", "currency"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["price_value", "currency"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product_hunt", "0003_product_upsert_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="currency",
+            field=models.CharField(default="USD", max_length=3),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="price_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["keyword", "price_value"], name="product_keyword_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["sentiment_score"], name="product_sentiment_idx"
+            ),
+        ),
+        # Runs after the schema changes so PostgreSQL has no pending trigger events
+        # when altering the table.
+        migrations.RunPython(populate_price_value, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 16:56
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize_keyword(keyword):
+    # Frozen copy of search.normalize_keyword as of this migration.
+    return " ".join(re.findall(r"\w+", keyword.lower()))
+
+
+def populate_normalized_keyword(apps, schema_editor):
+    """
+    Normalizes the keywords of existing jobs and fails all but the oldest active job
+    per keyword, so the unique constraint can be created.
+    """
+    ScrapeJob = apps.get_model("product_hunt", "ScrapeJob")
+    active = {}
+    for job in ScrapeJob.objects.order_by("created_at", "id").iterator():
+        job.normalized_keyword = normalize_keyword(job.keyword)
+        fields = ["normalized_keyword"]
+        if job.status in ("pending", "running"):
+            if job.normalized_keyword in active:
+                job.status = "failed"
+                job.error = f"Merged into job {active[job.normalized_keyword]}"
+                fields += ["status", "error"]
+            else:
+                active[job.normalized_keyword] = job.id
+        job.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0005_scrapejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapejob",
+            name="normalized_keyword",
+            field=models.CharField(default="", max_length=255),
+        ),
+        # ScrapeJob has no foreign keys, so updating rows before the constraint is
+        # created leaves no pending trigger events on PostgreSQL.
+        migrations.RunPython(populate_normalized_keyword, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="scrapejob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=("normalized_keyword",),
+                name="unique_active_scrapejob_keyword",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0006_scrapejob_single_flight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="scraped_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="scrapejob",
+            name="sites",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
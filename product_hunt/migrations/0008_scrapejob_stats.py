@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0007_scraped_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapejob",
+            name="stats",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
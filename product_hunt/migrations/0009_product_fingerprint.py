@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0008_scrapejob_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="fingerprint",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+    ]
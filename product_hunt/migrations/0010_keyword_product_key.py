@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0009_product_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Keyword",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="product_key",
+            field=models.CharField(default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="keywords",
+            field=models.ManyToManyField(blank=True, related_name="products", to="product_hunt.keyword"),
+        ),
+    ]
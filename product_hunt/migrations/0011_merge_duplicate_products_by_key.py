@@ -0,0 +1,130 @@
+# Generated by Django 4.2 on 2026-10-18 17:26
+
+import re
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations
+
+# Frozen copies of search.normalize_keyword, BaseScraper.product_key and the
+# built-in sites' product_id patterns as of this migration, so later changes to the
+# app code do not change what it does. Products of sites added through
+# SCRAPER_SITES_FILE are keyed by URL here; `manage.py dedupe_products` rekeys them.
+
+PRODUCT_ID_PATTERNS = {
+    "Amazon": r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})",
+    "Ebay": r"/itm/(?:[^/?#]+/)?(\d{9,})",
+    "Newegg": r"/p/([0-9A-Z]{2,}(?:-[0-9A-Z]+)*)",
+}
+
+TRACKING_PARAMS = {
+    "ref", "ref_", "qid", "sr", "keywords", "crid", "sprefix", "hash", "_trksid", "_trkparms", "fbclid", "gclid",
+}
+
+BATCH_SIZE = 2000
+
+
+def normalize_keyword(keyword):
+    return " ".join(re.findall(r"\w+", keyword.lower()))
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/") or "/", urlencode(query), ""))
+
+
+def product_key(website_name, url):
+    if not url:
+        return None
+    pattern = PRODUCT_ID_PATTERNS.get(website_name)
+    if pattern:
+        match = re.search(pattern, unquote(url))
+        if match:
+            return match.group(1)
+    return canonical_url(url)
+
+
+def link_product_keywords(Product, Keyword):
+    """
+    Links every product to the normalized form of its `keyword` field.
+    """
+    keywords = Product.objects.order_by().values_list("keyword", flat=True).distinct()
+    names = {keyword: normalize_keyword(keyword) for keyword in keywords}
+    Keyword.objects.bulk_create(
+        [Keyword(name=name) for name in set(names.values()) if name], batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    keyword_ids = dict(Keyword.objects.values_list("name", "id"))
+    Link = Product.keywords.through
+    links = []
+    for product_id, keyword in Product.objects.order_by().values_list("id", "keyword").iterator(chunk_size=BATCH_SIZE):
+        keyword_id = keyword_ids.get(names[keyword])
+        if keyword_id is not None:
+            links.append(Link(product_id=product_id, keyword_id=keyword_id))
+        if len(links) >= BATCH_SIZE:
+            Link.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    Link.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def merge_duplicate_products(Product):
+    """
+    Sets the product key of every product and keeps the most recently scraped row of
+    each (website, product_key), moving the keyword links of the others to it.
+    """
+    groups = {}
+    rows = Product.objects.order_by().values_list("id", "website_id", "website__name", "product_url", "scraped_at")
+    for product_id, website_id, website_name, url, scraped_at in rows.iterator(chunk_size=BATCH_SIZE):
+        key = product_key(website_name, url) or url
+        groups.setdefault((website_id, key), []).append((scraped_at, product_id))
+
+    keys = {}
+    duplicates = {}
+    for (website_id, key), group in groups.items():
+        group.sort(key=lambda row: (row[0] is not None, row[0], row[1]))
+        *older, (_, keep_id) = group
+        for _, product_id in older:
+            duplicates[product_id] = keep_id
+        keys[keep_id] = key
+
+    Link = Product.keywords.through
+    duplicate_ids = list(duplicates)
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        batch = duplicate_ids[start:start + BATCH_SIZE]
+        links = Link.objects.filter(product_id__in=batch).values_list("product_id", "keyword_id")
+        Link.objects.bulk_create(
+            [Link(product_id=duplicates[product_id], keyword_id=keyword_id) for product_id, keyword_id in links],
+            ignore_conflicts=True,
+        )
+        Product.objects.filter(id__in=batch).delete()
+    # product_key has no unique constraint yet, so the keys can be set directly.
+    changed = list(keys.items())
+    for start in range(0, len(changed), BATCH_SIZE):
+        Product.objects.bulk_update(
+            [Product(id=product_id, product_key=key) for product_id, key in changed[start:start + BATCH_SIZE]],
+            ["product_key"],
+        )
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Links the products to their keyword, computes their product keys and keeps one
+    row per (website, product_key), so the unique constraint of the next migration
+    can be created.
+    """
+    Product = apps.get_model("product_hunt", "Product")
+    Keyword = apps.get_model("product_hunt", "Keyword")
+    link_product_keywords(Product, Keyword)
+    merge_duplicate_products(Product)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product_hunt", "0010_keyword_product_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
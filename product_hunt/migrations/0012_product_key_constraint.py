@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("product_hunt", "0011_merge_duplicate_products_by_key"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="product",
+            name="unique_website_product_url_keyword",
+        ),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("website", "product_key"), name="unique_website_product_key"
+            ),
+        ),
+    ]
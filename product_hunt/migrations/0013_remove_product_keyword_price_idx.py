@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 17:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0012_product_key_constraint"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_keyword_price_idx",
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product_hunt", "0013_remove_product_keyword_price_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="scrapejob",
+            index=models.Index(
+                fields=["normalized_keyword", "finished_at"],
+                name="scrapejob_keyword_idx",
+            ),
+        ),
+    ]
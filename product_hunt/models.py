@@ -1,23 +1,97 @@
 from django.db import models
 
 class Website(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     url = models.URLField()
 
     def __str__(self):
         return self.name
 
+class Keyword(models.Model):
+    """
+    A search keyword in its normalized form (see search.normalize_keyword).
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     # price = models.DecimalField(max_digits=10, decimal_places=2)
     price = models.CharField(max_length=255, default="$ 0.0")
+    price_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)  # Parsed from price
+    currency = models.CharField(max_length=3, default="USD")
     reviews = models.TextField()
     product_url = models.URLField()
+    product_key = models.CharField(max_length=255, default='')  # Site's item id or normalized URL, see BaseScraper.product_key
     image_url = models.URLField()
     website = models.ForeignKey(Website, on_delete=models.CASCADE)
     sentiment_score = models.FloatField(default=0.5)
     sentiment_label = models.CharField(max_length=255, default="Neutral")
-    keyword = models.CharField(max_length=255)  # Add this field
+    keyword = models.CharField(max_length=255)  # Keyword the product was first found for
+    keywords = models.ManyToManyField(Keyword, related_name='products', blank=True)  # Every keyword it was found for
+    scraped_at = models.DateTimeField(null=True, blank=True)  # Last time a scrape saw this product
+    fingerprint = models.CharField(max_length=32, blank=True, default='')  # Hash of the scraped fields
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sentiment_score'], name='product_sentiment_idx'),
+        ]
+        constraints = [
+            # Re-scraping a product updates its row instead of adding a duplicate, even
+            # when it is found under another URL or for another keyword.
+            models.UniqueConstraint(fields=['website', 'product_key'], name='unique_website_product_key'),
+        ]
 
     def __str__(self):
         return f"Review for {self.name}"
+
+class ScrapeJob(models.Model):
+    """
+    A queued scrape of one keyword on all sites, executed by the scrape workers.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    keyword = models.CharField(max_length=255)
+    normalized_keyword = models.CharField(max_length=255, default='')  # See search.normalize_keyword
+    sites = models.JSONField(default=list, blank=True)  # Website names to scrape; empty means all
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    products_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    stats = models.JSONField(default=dict, blank=True)  # Pages, items and per-site stage timings of the run
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='scrapejob_status_idx'),
+            # Freshness of a keyword's results, see jobs.stale_sites.
+            models.Index(fields=['normalized_keyword', 'finished_at'], name='scrapejob_keyword_idx'),
+        ]
+        constraints = [
+            # At most one queued or running scrape per keyword; concurrent requests join it.
+            models.UniqueConstraint(
+                fields=['normalized_keyword'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_scrapejob_keyword',
+            ),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self):
+        return f"Scrape of '{self.keyword}' ({self.status})"
@@ -0,0 +1,144 @@
+"""
+Keyset ("cursor") pagination for the product API endpoints.
+
+Pages are selected with a WHERE clause on the ordering columns of the last row seen
+instead of an OFFSET, so fetching page 500 costs the same as fetching page 1 and
+rows inserted by a concurrent scrape never shift or repeat results.
+"""
+import base64
+import json
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPagination:
+    """
+    Paginates a queryset by its ordering columns.
+
+    Full-text results are ordered by ('-rank', 'id'), everything else by 'id'. The
+    cursor is an opaque token holding the ordering values of the last (or, for the
+    previous page, first) row of the current page.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, page_size=None, max_page_size=None):
+        self.page_size = page_size or getattr(settings, 'API_PAGE_SIZE', 100)
+        self.max_page_size = max_page_size or getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+    @staticmethod
+    def get_ordering(queryset):
+        return ('-rank', 'id') if 'rank' in queryset.query.annotations else ('id',)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """
+        Returns the (position, reverse) pair of the request's cursor, or (None, False).
+
+        Raises:
+            InvalidCursor: If the cursor was not produced by this paginator.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            return list(cursor['p']), bool(cursor.get('r'))
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor('Invalid cursor')
+
+    def encode_cursor(self, position, reverse=False):
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        token = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    @staticmethod
+    def _after(ordering, position, reverse):
+        """
+        Builds the filter selecting rows after `position` in the ordering (before it if reversed).
+        """
+        if len(position) != len(ordering):
+            raise InvalidCursor('Invalid cursor')
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= equal & Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, base_url=None):
+        """
+        Returns the rows of the requested page as a list.
+
+        Parameters:
+            queryset (QuerySet): The rows to paginate.
+            request (Request): The request carrying the cursor and page size.
+            base_url (str, optional): URL the next/previous links point to. Defaults to the request's URL.
+
+        Raises:
+            InvalidCursor: If the request carries a malformed cursor.
+        """
+        self.base_url = base_url or request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        self.ordering = self.get_ordering(queryset)
+
+        if reverse:
+            order_by = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            order_by = list(self.ordering)
+        queryset = queryset.order_by(*order_by)
+        if position is not None:
+            queryset = queryset.filter(self._after(self.ordering, position, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        self.page = rows[:page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        return self.page
+
+    def _position(self, row):
+        # Rows are model instances or values() dicts.
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_paginated_data(self, data, results_key='results'):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            results_key: data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
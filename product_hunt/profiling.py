@@ -0,0 +1,346 @@
+"""
+Opt-in profiling of requests and scrape jobs.
+
+With PROFILING_ENABLED set, ProfilingMiddleware profiles a request when it carries
+the PROFILING_HEADER header (its value must equal PROFILING_TOKEN; any value works
+when DEBUG is on) or when it is picked by PROFILING_SAMPLE_RATE. Scrape jobs are
+picked by PROFILING_JOB_SAMPLE_RATE.
+
+A profile records:
+
+- the Python hotspots, with cProfile (PROFILING_MODE = 'cprofile') or by sampling
+  thread stacks every PROFILING_SAMPLE_INTERVAL seconds ('sampling'). cProfile only
+  sees the thread it was started in; the sampler sees the request thread, or every
+  thread of the process for jobs, so the engine's fetch and parse threads are
+  included;
+- the count and time of the SQL queries, with the slowest statements;
+- the scrape stage timings of product_hunt.metrics.
+
+Each profile is written to PROFILING_DIR as JSON (plus a pstats .prof file in
+cProfile mode, for snakeviz and the like); `manage.py profile_summary` aggregates
+them. At most PROFILING_MAX_FILES profiles are kept.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from .metrics import collect_stages
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 50
+SLOWEST_QUERIES = 10
+
+# Innermost Python functions of threads that are idle, waiting for work; their
+# samples are dropped so thread pools and servers do not dominate the hotspots.
+IDLE_FUNCTIONS = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('selectors.py', 'select'),
+    ('socketserver.py', 'serve_forever'),
+}
+
+
+def profiling_enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def get_profile_dir():
+    return getattr(settings, 'PROFILING_DIR', None) or os.path.join(os.getcwd(), 'profiles')
+
+
+def function_label(filename, lineno, name):
+    return f"{filename}:{lineno}({name})"
+
+
+class QueryRecorder:
+    """
+    Counts and times the SQL queries run while it is the current recorder.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.statement_seconds = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.seconds += seconds
+                self.statements[sql] += 1
+                self.statement_seconds[sql] += seconds
+
+    def summary(self):
+        with self._lock:
+            slowest = self.statement_seconds.most_common(SLOWEST_QUERIES)
+            return {
+                'count': self.count,
+                'seconds': round(self.seconds, 4),
+                'slowest': [
+                    {'sql': sql, 'count': self.statements[sql], 'seconds': round(seconds, 4)}
+                    for sql, seconds in slowest
+                ],
+            }
+
+
+# Copied into asyncio tasks, to_thread() and sync_to_async() calls, so queries run
+# by the threads of a profiled request or job are recorded as well.
+_current_recorder = ContextVar('profiling_query_recorder', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_hook(connection, **kwargs):
+    """
+    Adds the query recorder hook to a new database connection; see connection_created.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of some threads from a background thread.
+
+    Samples of idle threads (see IDLE_FUNCTIONS) are skipped.
+
+    Parameters:
+        thread_ids (set, optional): Threads to sample. Defaults to every thread but the sampler.
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, thread_ids=None, interval=0.005):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.samples = 0
+        self.own = Counter()
+        self.total = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FUNCTIONS:
+                    continue
+                self.samples += 1
+                seen = set()
+                leaf = True
+                while frame is not None:
+                    code = frame.f_code
+                    label = function_label(code.co_filename, code.co_firstlineno, code.co_name)
+                    if leaf:
+                        self.own[label] += 1
+                        leaf = False
+                    if label not in seen:
+                        self.total[label] += 1
+                        seen.add(label)
+                    frame = frame.f_back
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='profiling-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        return [
+            {
+                'function': label,
+                'calls': None,
+                'tottime': round(self.own[label] * self.interval, 6),
+                'cumtime': round(self.total[label] * self.interval, 6),
+            }
+            for label in sorted(self.total, key=lambda label: (self.own[label], self.total[label]), reverse=True)[:limit]
+        ]
+
+
+def cprofile_top_functions(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler)
+    rows = [
+        {
+            'function': function_label(*key),
+            'calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        }
+        for key, (_, calls, tottime, cumtime, _) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row['tottime'], reverse=True)
+    return rows[:limit]
+
+
+class Capture:
+    """
+    One profile in progress; `info` is written with it.
+    """
+
+    def __init__(self, kind, name, mode, thread_ids=None):
+        self.id = f"{timezone.now():%Y%m%dT%H%M%S}-{kind}-{uuid.uuid4().hex[:8]}"
+        self.kind = kind
+        self.name = name
+        self.mode = mode
+        self.info = {}
+        self.queries = QueryRecorder()
+        self.profiler = cProfile.Profile() if mode == 'cprofile' else None
+        self.sampler = None
+        if mode == 'sampling':
+            self.sampler = StackSampler(thread_ids, getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005))
+
+    def save(self, seconds, stages):
+        directory = get_profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        if self.profiler is not None:
+            functions = cprofile_top_functions(self.profiler)
+            self.profiler.dump_stats(os.path.join(directory, f"{self.id}.prof"))
+        else:
+            functions = self.sampler.top_functions()
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'mode': self.mode,
+            'created_at': timezone.now().isoformat(),
+            'seconds': round(seconds, 4),
+            **self.info,
+            'sql': self.queries.summary(),
+            'stages': stages,
+            'functions': functions,
+        }
+        with open(os.path.join(directory, f"{self.id}.json"), 'w') as f:
+            json.dump(data, f, indent=1)
+        prune_profiles(directory)
+
+
+def prune_profiles(directory):
+    """
+    Deletes the oldest profiles beyond PROFILING_MAX_FILES.
+    """
+    keep = getattr(settings, 'PROFILING_MAX_FILES', 500)
+    ids = sorted({name.rsplit('.', 1)[0] for name in os.listdir(directory) if name.endswith('.json')})
+    for profile_id in ids[:max(0, len(ids) - keep)]:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(directory, f"{profile_id}.{extension}"))
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def profile(kind, name, thread_ids=None):
+    """
+    Profiles the block and writes the profile when it exits.
+
+    Parameters:
+        kind (str): 'request' or 'job'.
+        name (str): What is profiled, e.g. the request path or the job keyword.
+        thread_ids (set, optional): Threads the sampler looks at (sampling mode only).
+
+    Yields:
+        Capture: The profile; add fields to its `info` dict to store them with it.
+    """
+    capture = Capture(kind, name, getattr(settings, 'PROFILING_MODE', 'cprofile'), thread_ids)
+    token = _current_recorder.set(capture.queries)
+    started = time.perf_counter()
+    try:
+        with collect_stages() as stages:
+            if capture.profiler is not None:
+                capture.profiler.enable()
+            else:
+                capture.sampler.start()
+            try:
+                yield capture
+            finally:
+                if capture.profiler is not None:
+                    capture.profiler.disable()
+                else:
+                    capture.sampler.stop()
+    finally:
+        _current_recorder.reset(token)
+        try:
+            capture.save(time.perf_counter() - started, stages.summary())
+        except Exception as e:
+            logger.error(f"Failed to save profile {capture.id}: {str(e)}")
+
+
+@contextmanager
+def maybe_profile_job(keyword):
+    """
+    Profiles a scrape job if it is picked by PROFILING_JOB_SAMPLE_RATE; yields the
+    Capture, or None when the job is not profiled.
+    """
+    rate = getattr(settings, 'PROFILING_JOB_SAMPLE_RATE', 0.0)
+    if not profiling_enabled() or not rate or random.random() >= rate:
+        yield None
+        return
+    with profile('job', keyword) as capture:
+        yield capture
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests selected by the PROFILING_HEADER header or PROFILING_SAMPLE_RATE.
+
+    A profiled response carries the id of its profile in an X-Profile-Id header.
+    The middleware removes itself when PROFILING_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not profiling_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.header = 'HTTP_' + getattr(settings, 'PROFILING_HEADER', 'X-Profile').upper().replace('-', '_')
+
+    def wants_profile(self, request):
+        value = request.META.get(self.header)
+        if value:
+            token = getattr(settings, 'PROFILING_TOKEN', '')
+            if (token and value == token) or (not token and settings.DEBUG):
+                return True
+        rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        return bool(rate) and random.random() < rate
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+        with profile('request', request.path, thread_ids={threading.get_ident()}) as capture:
+            response = self.get_response(request)
+            capture.info.update({
+                'method': request.method,
+                'query': re.sub(r'cursor=[^&]*', 'cursor=...', request.META.get('QUERY_STRING', '')),
+                'status': response.status_code,
+            })
+        response['X-Profile-Id'] = capture.id
+        return response
@@ -0,0 +1,717 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import hashlib
+import logging
+import random
+import re
+import threading
+from urllib.parse import parse_qsl, quote_plus, unquote, urlencode, urljoin, urlsplit, urlunsplit
+from ..models import Keyword, Website, Product
+from ..apicache import invalidate_keywords
+from ..search import normalize_keyword
+from ..metrics import ERRORS, FETCHES, ITEMS, ROWS_WRITTEN, UNCHANGED_ITEMS, timed
+from .utils import NEUTRAL_SENTIMENT, parse_price, review_sentiments
+from .ratelimit import get_bucket
+from .httpcache import get_http_cache
+from .parsing import CompiledSelectors, parse_document
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/104.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Firefox/89.0',
+    # Add more user agents here
+]
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """
+    Returns the shared requests.Session for the host of the given URL.
+
+    Sessions are created lazily, one per host, and reused across pages, keywords,
+    scraper instances and threads so that TCP/TLS connections are kept alive.
+
+    Parameters:
+        url (str): Any URL on the host the session is needed for.
+
+    Returns:
+        requests.Session: The pooled session for that host.
+    """
+    host = urlsplit(url).netloc.lower()
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=getattr(settings, 'SCRAPER_MAX_RETRIES', 2),
+                backoff_factor=getattr(settings, 'SCRAPER_BACKOFF_FACTOR', 0.5),
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                raise_on_status=False,
+            )
+            pool_size = getattr(settings, 'SCRAPER_POOL_SIZE', 10)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Connection': 'keep-alive'})
+            _sessions[host] = session
+        return session
+
+
+PRODUCT_UPDATE_FIELDS = [
+    'name', 'price', 'price_value', 'currency', 'reviews', 'product_url', 'image_url',
+    'sentiment_score', 'sentiment_label', 'scraped_at', 'fingerprint',
+]
+
+# The scraped fields a product's fingerprint covers. The others are derived from them,
+# except product_url: its tracking parameters change between searches, and products
+# are matched to their stored row by product key.
+FINGERPRINT_FIELDS = ('name', 'price', 'reviews', 'image_url')
+
+
+def product_fingerprint(fields):
+    """
+    Returns a short hash of the scraped fields of a product.
+
+    Parameters:
+        fields (dict): The extracted fields, see BaseScraper.extract_fields().
+
+    Returns:
+        str: 32 hex digits that change whenever one of FINGERPRINT_FIELDS changes.
+    """
+    text = '\x1f'.join(fields[name] or '' for name in FINGERPRINT_FIELDS)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# Query parameters that only record how a product link was reached.
+TRACKING_PARAMS = {
+    'ref', 'ref_', 'qid', 'sr', 'keywords', 'crid', 'sprefix', 'hash', '_trksid', '_trkparms', 'fbclid', 'gclid',
+}
+
+
+def canonical_url(url):
+    """
+    Returns the URL without its fragment and tracking parameters, with a lower-case
+    scheme and host, no trailing slash and the remaining query parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', urlencode(query), ''))
+
+
+def save_products(products):
+    """
+    Upserts Product objects on (website, product_key) in one transaction, in batches
+    of SCRAPER_DB_BATCH_SIZE rows.
+
+    Parameters:
+        products (iterable): Unsaved Product objects, at most one per (website, product_key).
+    """
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products,
+            batch_size=getattr(settings, 'SCRAPER_DB_BATCH_SIZE', 500),
+            update_conflicts=True,
+            unique_fields=['website', 'product_key'],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+
+
+def touch_products(website, product_keys, scraped_at):
+    """
+    Marks stored products as seen by a scrape without rewriting them.
+
+    Parameters:
+        website (Website): The products' website.
+        product_keys (iterable): The product keys of the unchanged products.
+        scraped_at (datetime): The scrape time.
+    """
+    product_keys = list(product_keys)
+    batch_size = getattr(settings, 'SCRAPER_DB_BATCH_SIZE', 500)
+    with transaction.atomic():
+        for start in range(0, len(product_keys), batch_size):
+            Product.objects.filter(website=website, product_key__in=product_keys[start:start + batch_size]).update(
+                scraped_at=scraped_at
+            )
+
+
+def link_keyword(website, product_keys, keyword):
+    """
+    Associates stored products with a keyword they were found for; existing links are kept.
+
+    Parameters:
+        website (Website): The products' website.
+        product_keys (iterable): The product keys of the products.
+        keyword (str): The search keyword, stored in its normalized form.
+
+    Returns:
+        list: The ids of the products.
+    """
+    product_keys = list(product_keys)
+    batch_size = getattr(settings, 'SCRAPER_DB_BATCH_SIZE', 500)
+    product_ids = []
+    for start in range(0, len(product_keys), batch_size):
+        product_ids += Product.objects.filter(
+            website=website, product_key__in=product_keys[start:start + batch_size]
+        ).values_list('id', flat=True)
+    name = normalize_keyword(keyword)
+    if not name:
+        return product_ids
+    keyword_id = Keyword.objects.get_or_create(name=name)[0].id
+    Link = Product.keywords.through
+    with transaction.atomic():
+        for start in range(0, len(product_ids), batch_size):
+            Link.objects.bulk_create(
+                [Link(product_id=product_id, keyword_id=keyword_id) for product_id in product_ids[start:start + batch_size]],
+                ignore_conflicts=True,
+            )
+    return product_ids
+
+
+def linked_keywords(product_ids):
+    """
+    Returns the names of every keyword linked to any of the products.
+
+    A product is shared by all the keywords it was found for, so when it changes the
+    cached responses of all of them are stale, not only those of the scraped keyword.
+    """
+    product_ids = list(product_ids)
+    batch_size = getattr(settings, 'SCRAPER_DB_BATCH_SIZE', 500)
+    names = set()
+    for start in range(0, len(product_ids), batch_size):
+        names.update(
+            Keyword.objects.filter(products__id__in=product_ids[start:start + batch_size])
+            .values_list('name', flat=True)
+            .distinct()
+        )
+    return names
+
+
+class BaseScraper:
+    """
+    Common fetch/parse/persist logic shared by the site scrapers.
+
+    Site scrapers only describe where things are: the search URL template and the
+    CSS selectors for the result items and their fields. The sites are declared as
+    data in scrapers.sites and their classes built from it; the selectors are
+    compiled to lxml XPath once per class. The clean_* methods can be overridden
+    when a raw field value needs post-processing that a field pattern cannot express.
+    """
+
+    website_name = None
+    HOME_URL = None
+    SEARCH_URL = None
+    PAGE_PARAM = 'page'
+
+    ITEM_SELECTOR = None
+    NEXT_PAGE_SELECTOR = None
+    # Field name -> field spec (see parsing.FieldSelector.from_spec).
+    FIELDS = None
+    DEFAULT_REVIEWS = None
+    CURRENCY = 'USD'
+    # Regular expression whose first group is the site's item id in a product URL
+    # (e.g. an ASIN); see product_key().
+    PRODUCT_ID_PATTERN = None
+
+    REQUESTS_PER_SECOND = 1.0
+
+    def __init__(self, base_url, max_pages=2):
+        """
+        Initializes an instance of the scraper.
+
+        Args:
+            base_url (str): The search results URL to start scraping from.
+            max_pages (int, optional): The maximum number of pages to scrape. Defaults to 2.
+
+        Returns:
+            None
+
+        Sets the user agents and timeout for making HTTP requests.
+        """
+        self.base_url = base_url
+        self.max_pages = max_pages
+        self.USER_AGENTS = USER_AGENTS
+        self.TIMEOUT = getattr(settings, 'SCRAPER_TIMEOUT', 10)
+
+    @classmethod
+    def for_keyword(cls, keyword, **kwargs):
+        """
+        Builds a scraper for the search results page of the given keyword.
+
+        Parameters:
+            keyword (str): The search keyword.
+
+        Returns:
+            BaseScraper: A scraper starting at the site's search URL for the keyword.
+        """
+        return cls(cls.SEARCH_URL.format(keyword=quote_plus(keyword)), **kwargs)
+
+    def page_url(self, page):
+        """
+        Builds the URL of the given results page directly from the search URL.
+
+        Parameters:
+            page (int): The 1-based page number.
+
+        Returns:
+            str: The URL of that page, so pages can be fetched without following the "next" links.
+        """
+        if page <= 1:
+            return self.base_url
+        parts = urlsplit(self.base_url)
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != self.PAGE_PARAM]
+        query.append((self.PAGE_PARAM, str(page)))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def get_rate_limit(self):
+        """
+        Returns the allowed requests per second for this site.
+
+        SCRAPER_RATE_LIMITS in settings overrides the class default per website name.
+        """
+        rate_limits = getattr(settings, 'SCRAPER_RATE_LIMITS', {})
+        return rate_limits.get(self.website_name, self.REQUESTS_PER_SECOND)
+
+    def wait_for_rate_limit(self, url):
+        """
+        Blocks until the per-host token bucket allows another request to the URL's host.
+        """
+        bucket = get_bucket(
+            urlsplit(url).netloc.lower(),
+            self.get_rate_limit(),
+            capacity=getattr(settings, 'SCRAPER_RATE_LIMIT_BURST', 1),
+            directory=getattr(settings, 'SCRAPER_RATE_LIMIT_DIR', None),
+        )
+        with timed(self.website_name, 'rate_limit'):
+            waited = bucket.acquire()
+        if waited:
+            logging.debug(f"Rate limited {url} for {waited:.2f}s")
+
+    def get_http_cache(self):
+        """
+        Returns the on-disk HTTP cache configured in settings, or None if it is disabled.
+        """
+        return get_http_cache(
+            getattr(settings, 'SCRAPER_HTTP_CACHE_DIR', None),
+            max_size=getattr(settings, 'SCRAPER_HTTP_CACHE_MAX_SIZE', 256 * 1024 * 1024),
+        )
+
+    def fetch_html(self, url, timeout=None):
+        """
+        Fetches the HTML content of a webpage using the provided URL.
+
+        The request goes through the pooled session of the URL's host, so the
+        connection is reused for the following pages, and waits for the host's
+        rate limiter first to avoid being blocked.
+
+        Responses are kept in the on-disk HTTP cache. A page cached less than
+        SCRAPER_HTTP_CACHE_MAX_AGE seconds ago is returned without a request; an older
+        one is revalidated with a conditional GET and reused if the server answers
+        304 Not Modified.
+
+        Parameters:
+            url (str): The URL of the webpage to fetch.
+            timeout (float, optional): Timeout of the request in seconds. Defaults to SCRAPER_TIMEOUT.
+
+        Returns:
+            str or None: The HTML content of the webpage if the request is successful, None otherwise.
+        """
+        cache = self.get_http_cache()
+        cached = cache.get(url) if cache else None
+        if cached and cached.age() < getattr(settings, 'SCRAPER_HTTP_CACHE_MAX_AGE', 900):
+            FETCHES.inc(site=self.website_name, outcome='cached')
+            return cached.text
+        try:
+            headers = {
+                "User-Agent": random.choice(self.USER_AGENTS),
+                "Accept-Language": "en-US,en;q=0.5",
+                "Referer": self.HOME_URL
+            }
+            if cached:
+                headers.update(cached.conditional_headers())
+            self.wait_for_rate_limit(url)
+            with timed(self.website_name, 'fetch'):
+                response = get_session(url).get(url, headers=headers, timeout=timeout or self.TIMEOUT)
+            if cached and response.status_code == 304:
+                FETCHES.inc(site=self.website_name, outcome='not_modified')
+                return cache.revalidated(cached).text
+            response.raise_for_status()
+            FETCHES.inc(site=self.website_name, outcome='ok')
+            if cache:
+                try:
+                    cache.store(
+                        url,
+                        response.content,
+                        encoding=response.encoding or response.apparent_encoding,
+                        etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified'),
+                    )
+                except OSError as e:
+                    logging.error(f"Failed to cache webpage: {url}. Exception: {str(e)}")
+            return response.text
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to fetch webpage: {url}. Exception: {str(e)}")
+            FETCHES.inc(site=self.website_name, outcome='error')
+            return None
+
+    @classmethod
+    def field_specs(cls):
+        """
+        Returns the field specs of the site, keyed by product field name.
+        """
+        return cls.FIELDS
+
+    @classmethod
+    def product_key(cls, url):
+        """
+        Returns the key identifying a product of the site whatever URL it was found
+        under: the item id matched by PRODUCT_ID_PATTERN, or the canonical URL.
+
+        Parameters:
+            url (str): The product URL.
+
+        Returns:
+            str: The product key, or None without a URL.
+        """
+        if not url:
+            return None
+        if cls.PRODUCT_ID_PATTERN:
+            match = re.search(cls.PRODUCT_ID_PATTERN, unquote(url))
+            if match:
+                return match.group(1)
+        return canonical_url(url)
+
+    @classmethod
+    def get_selectors(cls):
+        """
+        Returns the site's selectors compiled to XPath, compiling them on first use.
+
+        Returns:
+            CompiledSelectors: The item, field and pagination selectors of the site.
+        """
+        selectors = cls.__dict__.get('_selectors')
+        if selectors is None:
+            selectors = CompiledSelectors(cls.ITEM_SELECTOR, cls.field_specs(), cls.NEXT_PAGE_SELECTOR)
+            cls._selectors = selectors
+        return selectors
+
+    def parse_html(self, html_text):
+        """
+        Parses the given HTML text with lxml and returns the root element.
+
+        Parameters:
+            html_text (str): The HTML text to be parsed.
+
+        Returns:
+            lxml.html.HtmlElement: The parsed HTML document, or None if it cannot be parsed.
+        """
+        try:
+            with timed(self.website_name, 'parse'):
+                return parse_document(html_text)
+        except Exception as e:
+            logging.error(f"Error parsing HTML: {str(e)}")
+            ERRORS.inc(site=self.website_name, stage='parse')
+            return None
+
+    def clean_price(self, price):
+        """
+        Strips everything but digits, dots and the dollar sign from the raw price text.
+        """
+        return re.sub(r'[^\d$.]+', '', price) if price else None
+
+    def clean_reviews(self, reviews):
+        """
+        Returns the reviews text to store, or DEFAULT_REVIEWS if there is none.
+        """
+        return reviews if reviews else self.DEFAULT_REVIEWS
+
+    def clean_url(self, url):
+        """
+        Resolves a (possibly relative) link against the site's home URL.
+        """
+        return urljoin(self.HOME_URL, url) if url else None
+
+    def extract_fields(self, item):
+        """
+        Extracts the product fields of one result item in a single pass over its selectors.
+
+        Parameters:
+            item (lxml.html.HtmlElement): The element of one search result.
+
+        Returns:
+            dict: The name, price (as displayed, plus the parsed price_value and currency),
+                reviews, product_url and image_url of the product. Fields that cannot be
+                found are None.
+        """
+        try:
+            fields = self.get_selectors().extract(item)
+            price_value, currency = parse_price(fields['price'], self.CURRENCY)
+            return {
+                'name': fields['name'],
+                'price': self.clean_price(fields['price']),
+                'price_value': price_value,
+                'currency': currency,
+                'reviews': self.clean_reviews(fields['reviews']),
+                'product_url': self.clean_url(fields['product_url']),
+                'image_url': fields['image_url'],
+            }
+        except Exception as e:
+            logging.error(f"Error extracting product fields: {str(e)}")
+            ERRORS.inc(site=self.website_name, stage='extract')
+            return dict.fromkeys(['name', 'price', 'price_value', 'currency', 'reviews', 'product_url', 'image_url'])
+
+    def score_reviews(self, reviews):
+        """
+        Computes the sentiment of a page worth of reviews with one batch call.
+
+        Parameters:
+            reviews (list): The reviews text of each product (None when there is none).
+
+        Returns:
+            list: For each product, a dictionary containing the reviews, sentiment score, and sentiment label.
+        """
+        try:
+            return review_sentiments(reviews)
+        except Exception as e:
+            logging.error(f"Error scoring product reviews: {str(e)}")
+            ERRORS.inc(site=self.website_name, stage='sentiment')
+            return [dict(NEUTRAL_SENTIMENT) for _ in reviews]
+
+    def get_next_page_url(self, root):
+        """
+        Extracts the next page URL from the parsed results page.
+
+        Parameters:
+            root (lxml.html.HtmlElement): The parsed HTML document.
+
+        Returns:
+            str: The URL of the next page. If the next page URL cannot be found, it returns None.
+        """
+        try:
+            return self.clean_url(self.get_selectors().next_page_url(root))
+        except Exception as e:
+            logging.error(f"Error finding next page URL: {str(e)}")
+            return None
+
+    def drop_placeholder_rows(self, product_data):
+        try:
+            return [product for product in product_data if all(value is not None for value in product.values())]
+        except Exception as e:
+            logging.error(f"Error dropping placeholder rows: {str(e)}")
+            return product_data
+
+    def load_fingerprints(self, keyword):
+        """
+        Returns what is needed to recognize the stored products of the keyword that
+        have not changed since they were scraped.
+
+        Parameters:
+            keyword (str): The search keyword.
+
+        Returns:
+            dict: product_key -> (fingerprint, sentiment_score, sentiment_label) of the
+                site's stored products for the keyword; empty when SCRAPER_SKIP_UNCHANGED is off.
+        """
+        if not getattr(settings, 'SCRAPER_SKIP_UNCHANGED', True):
+            return {}
+        rows = Product.objects.filter(
+            website__name=self.website_name, keywords__name=normalize_keyword(keyword)
+        ).exclude(fingerprint='')
+        return {
+            key: (fingerprint, score, label)
+            for key, fingerprint, score, label in rows.values_list(
+                'product_key', 'fingerprint', 'sentiment_score', 'sentiment_label'
+            )
+        }
+
+    def extract_items(self, root, known=None):
+        """
+        Extracts all products of a parsed results page.
+
+        Parameters:
+            root (lxml.html.HtmlElement): The parsed HTML document.
+            known (dict, optional): Stored fingerprints, see load_fingerprints().
+
+        Returns:
+            list: One product dict per result item, with its product key and fingerprint.
+                The reviews of the whole page are scored in a single sentiment batch,
+                except those of products whose fingerprint matches the stored one: these
+                keep their stored sentiment and are flagged `unchanged`.
+        """
+        known = known or {}
+        with timed(self.website_name, 'extract'):
+            items = [self.extract_fields(item) for item in self.get_selectors().items(root)]
+            keys = [self.product_key(fields['product_url']) for fields in items]
+            fingerprints = [product_fingerprint(fields) for fields in items]
+        unchanged = [known.get(key, (None,))[0] == fingerprint for key, fingerprint in zip(keys, fingerprints)]
+        with timed(self.website_name, 'sentiment'):
+            scored = iter(self.score_reviews([fields['reviews'] for fields, same in zip(items, unchanged) if not same]))
+        product_data = []
+        for fields, key, fingerprint, same in zip(items, keys, fingerprints, unchanged):
+            if same:
+                _, score, label = known[key]
+                reviews = {'reviews': fields['reviews'] or None, 'sentiment_score': score, 'sentiment_label': label}
+            else:
+                reviews = next(scored)
+            product_data.append({
+                "name": fields['name'],
+                "price": fields['price'],
+                "price_value": fields['price_value'],
+                "currency": fields['currency'],
+                "reviews": reviews['reviews'],
+                "sentiment_score": reviews['sentiment_score'],
+                "sentiment_label": reviews['sentiment_label'],
+                "product_url": fields['product_url'],
+                "product_key": key,
+                "image_url": fields['image_url'],
+                "fingerprint": fingerprint,
+                "unchanged": same,
+            })
+        return product_data
+
+    def scrape_page(self, url, known=None):
+        """
+        Fetches and parses one results page.
+
+        Parameters:
+            url (str): The URL of the results page.
+            known (dict, optional): Stored fingerprints, see load_fingerprints().
+
+        Returns:
+            tuple: The list of product dicts found on the page and the URL of the next page
+                (None when there is no next page). Both come from a single fetch and parse.
+        """
+        try:
+            html_text = self.fetch_html(url)
+            if not html_text:
+                return [], None
+            product_data, next_page_url = self.parse_page(html_text, known)
+            ITEMS.inc(len(product_data), site=self.website_name)
+            UNCHANGED_ITEMS.inc(sum(product['unchanged'] for product in product_data), site=self.website_name)
+            return product_data, next_page_url
+        except Exception as e:
+            logging.error(f"Error scraping page: {str(e)}")
+            return [], None
+
+    def parse_page(self, html_text, known=None):
+        """
+        Parses a fetched results page into products.
+
+        Only CPU work happens here (no network or database access), so the parser
+        processes of scrapers.pipeline can run it.
+
+        Parameters:
+            html_text (str): The HTML of the results page.
+            known (dict, optional): Stored fingerprints, see load_fingerprints().
+
+        Returns:
+            tuple: The list of product dicts found on the page and the URL of the next page.
+        """
+        root = self.parse_html(html_text)
+        if root is None:
+            return [], None
+        return self.extract_items(root, known), self.get_next_page_url(root)
+
+    def get_website(self):
+        """
+        Returns the Website row of this site, creating it on first use and correcting
+        its URL if it is not the site's home page.
+        """
+        website, created = Website.objects.get_or_create(name=self.website_name, defaults={'url': self.HOME_URL})
+        if website.url != self.HOME_URL:
+            website.url = self.HOME_URL
+            website.save(update_fields=['url'])
+        return website
+
+    def build_products(self, product_data, keyword, website, scraped_at=None):
+        """
+        Builds unsaved Product objects from scraped product dicts.
+
+        Parameters:
+            product_data (list): The product dicts.
+            keyword (str): The search keyword the products were found for.
+            website (Website): The site's Website row.
+            scraped_at (datetime, optional): The scrape time. Defaults to now.
+
+        Returns:
+            dict: The products keyed by product_key, one per key.
+        """
+        scraped_at = scraped_at or timezone.now()
+        return {
+            product['product_key']: Product(
+                name=product['name'],
+                price=product['price'],
+                price_value=product['price_value'],
+                currency=product['currency'],
+                reviews=product['reviews'],
+                product_url=product['product_url'],
+                product_key=product['product_key'],
+                image_url=product['image_url'],
+                website=website,
+                sentiment_score=product['sentiment_score'],
+                sentiment_label=product['sentiment_label'],
+                keyword=keyword,
+                scraped_at=scraped_at,
+                fingerprint=product['fingerprint'],
+            )
+            for product in product_data
+        }
+
+    @staticmethod
+    def split_unchanged(product_data):
+        """
+        Separates the products that must be written from those matching their stored row.
+
+        Returns:
+            tuple: The list of changed or new product dicts and the set of the product
+                keys of the unchanged ones.
+        """
+        changed = [product for product in product_data if not product.get('unchanged')]
+        unchanged = {product['product_key'] for product in product_data if product.get('unchanged')}
+        return changed, unchanged
+
+    def save_to_database(self, product_data, keyword):
+        """
+        Saves the scraped products in one transaction using batched INSERTs.
+
+        Products are upserted on (website, product_key): a product that is already
+        stored, for this or another keyword, gets its fields updated instead of being
+        inserted again, and every saved product is linked to the keyword. Products whose
+        fingerprint matches their stored row (see extract_items) are not rewritten; only
+        their scraped_at is updated. The cached responses of every keyword linked to the
+        saved products are invalidated.
+
+        Parameters:
+            product_data (list): The product dicts to save.
+            keyword (str): The search keyword the products were found for.
+
+        Returns:
+            int: The number of products written.
+        """
+        try:
+            changed, unchanged = self.split_unchanged(product_data)
+            # One row per key: a batch may not upsert the same row twice.
+            with timed(self.website_name, 'db_write'):
+                website = self.get_website()
+                scraped_at = timezone.now()
+                products = self.build_products(changed, keyword, website, scraped_at)
+                save_products(products.values())
+                if unchanged:
+                    touch_products(website, unchanged - products.keys(), scraped_at)
+                product_ids = link_keyword(website, unchanged | products.keys(), keyword)
+            invalidate_keywords(linked_keywords(product_ids) | {keyword})
+            ROWS_WRITTEN.inc(len(products), site=self.website_name)
+            return len(products)
+        except Exception as e:
+            logging.error(f"Error saving to database: {str(e)}")
+            ERRORS.inc(site=self.website_name, stage='db_write')
+            return 0
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from collections import Counter
+from urllib.parse import urlsplit
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ..metrics import ERRORS
+from .pipeline import parse_page
+from .sites import SCRAPERS
+
+
+def get_scrapers(site_names=None):
+    """
+    Returns the scraper classes for the given website names (all of them by default).
+    """
+    if not site_names:
+        return list(SCRAPERS)
+    wanted = {name.lower() for name in site_names}
+    return [Scraper for Scraper in SCRAPERS if Scraper.website_name.lower() in wanted]
+
+
+class ScrapeEngine:
+    """
+    Scrapes a keyword on all sites concurrently with asyncio.
+
+    Every results page of every site is a separate task, so a keyword takes roughly
+    as long as the slowest site instead of the sum of all page latencies. Only the
+    first page of a site is fetched up front; the others follow once it shows a
+    "next page" link. The blocking
+    fetch/parse work of the scrapers runs in worker threads (keeping the pooled
+    sessions and per-host rate limiters), bounded by a semaphore per host.
+    """
+
+    def __init__(self, scrapers=None, max_pages=None, host_concurrency=None, page_timeout=None, timeout=None):
+        """
+        Parameters:
+            scrapers (list, optional): Scraper classes to run. Defaults to all sites.
+            max_pages (int, optional): Results pages per site. Defaults to SCRAPER_MAX_PAGES.
+            host_concurrency (int, optional): Concurrent page requests per host.
+            page_timeout (float, optional): Timeout in seconds of one page request.
+            timeout (float, optional): Seconds allowed for the whole keyword.
+        """
+        self.scrapers = scrapers or list(SCRAPERS)
+        self.max_pages = max_pages or getattr(settings, 'SCRAPER_MAX_PAGES', 2)
+        self.host_concurrency = host_concurrency or getattr(settings, 'SCRAPER_HOST_CONCURRENCY', 4)
+        self.page_timeout = page_timeout or getattr(settings, 'SCRAPER_PAGE_TIMEOUT', 30)
+        self.timeout = timeout or getattr(settings, 'SCRAPER_KEYWORD_TIMEOUT', 120)
+        self._semaphores = {}
+        # Running totals over all keywords: pages fetched, failed pages, products parsed.
+        self.stats = Counter()
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc.lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._semaphores[host]
+
+    async def scrape_page(self, scraper, url, known=None):
+        """
+        Fetches one page in a worker thread and parses it in the parser pool (see
+        scrapers.pipeline), or in a thread when the pool is disabled. Products matching
+        the `known` fingerprints are not scored again (see BaseScraper.extract_items).
+
+        The page timeout applies to the HTTP request only: waiting for the host's
+        semaphore and rate limiter is bounded by the keyword timeout instead, so pages
+        queued behind others do not time out.
+
+        Returns:
+            tuple or None: The products found on the page and the URL of its next page
+                (None on the last page), or None on error.
+        """
+        try:
+            async with self._semaphore(url):
+                html_text = await asyncio.to_thread(scraper.fetch_html, url, self.page_timeout)
+            self.stats['pages'] += 1
+            if not html_text:
+                self.stats['page_errors'] += 1
+                return None
+            product_data, next_page_url = await parse_page(scraper, html_text, known)
+        except Exception as e:
+            logging.error(f"Error scraping page: {url}. Exception: {str(e)}")
+            self.stats['page_errors'] += 1
+            ERRORS.inc(site=scraper.website_name, stage='page')
+            return None
+        self.stats['items'] += len(product_data)
+        self.stats['unchanged'] += sum(product['unchanged'] for product in product_data)
+        return product_data, next_page_url
+
+    async def scrape_site(self, Scraper, keyword, save=True, errors=None):
+        """
+        Scrapes the results pages of one site and saves the products.
+
+        Page 1 is fetched first; the remaining pages are fetched concurrently only if
+        it has a "next page" link (or the site has no next page selector to tell).
+        Pages that failed are counted in `errors['pages']`.
+
+        Returns:
+            list: The products scraped from the site.
+        """
+        scraper = Scraper.for_keyword(keyword, max_pages=self.max_pages)
+        known = await sync_to_async(scraper.load_fingerprints)(keyword)
+        pages = [await self.scrape_page(scraper, scraper.page_url(1), known)]
+        paginated = pages[0] is not None and (pages[0][1] or scraper.get_selectors().next_page is None)
+        if paginated and self.max_pages > 1:
+            pages += await asyncio.gather(*(
+                self.scrape_page(scraper, scraper.page_url(page), known) for page in range(2, self.max_pages + 1)
+            ))
+        if errors is not None:
+            errors['pages'] += sum(page is None for page in pages)
+        product_data = scraper.drop_placeholder_rows([product for page in pages if page for product in page[0]])
+        if save:
+            await sync_to_async(scraper.save_to_database)(product_data, keyword)
+        logging.info(f"{scraper.website_name}: {len(product_data)} products for keyword '{keyword}'")
+        return product_data
+
+    async def scrape_keyword(self, keyword, save=True, errors=None):
+        """
+        Scrapes the keyword on all sites concurrently.
+
+        Sites that fail or do not finish within the keyword timeout are cancelled and
+        reported with no products; the others are still saved.
+
+        Parameters:
+            keyword (str): The search keyword.
+            save (bool, optional): Whether to save the products to the database. Defaults to True.
+            errors (Counter, optional): Receives the keyword's failed pages and sites
+                under 'pages' and 'sites'.
+
+        Returns:
+            dict: The scraped products per website name.
+        """
+        if errors is None:
+            errors = Counter()
+        tasks = {
+            Scraper.website_name: asyncio.create_task(self.scrape_site(Scraper, keyword, save=save, errors=errors))
+            for Scraper in self.scrapers
+        }
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        results = {}
+        for website_name, task in tasks.items():
+            if task in pending:
+                logging.error(f"Timed out scraping {website_name} for keyword '{keyword}'")
+                self.stats['site_errors'] += 1
+                errors['sites'] += 1
+                ERRORS.inc(site=website_name, stage='site_timeout')
+                results[website_name] = []
+            elif task.exception():
+                logging.error(f"Error scraping {website_name} for keyword '{keyword}': {str(task.exception())}")
+                self.stats['site_errors'] += 1
+                errors['sites'] += 1
+                ERRORS.inc(site=website_name, stage='site')
+                results[website_name] = []
+            else:
+                results[website_name] = task.result()
+        return results
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight task.
+
+    The first caller for a key starts the task; callers arriving while it runs await
+    the same task and get its result. A caller that is cancelled (e.g. its client
+    disconnected) does not cancel the shared task.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def run(self, key, coroutine_function, *args, **kwargs):
+        """
+        Awaits coroutine_function(*args, **kwargs), sharing it with concurrent callers of the same key.
+        """
+        # Tasks belong to one event loop; under WSGI every async request gets its own.
+        key = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_function(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
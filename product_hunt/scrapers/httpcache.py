@@ -0,0 +1,308 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+class CachedResponse:
+    """
+    A response body stored in the HTTP cache, with the validators needed to revalidate it.
+    """
+
+    def __init__(self, url, body, encoding=None, etag=None, last_modified=None, stored_at=0.0):
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+    def age(self):
+        """
+        Returns the seconds since the response was fetched or last revalidated.
+        """
+        return time.time() - self.stored_at
+
+    def conditional_headers(self):
+        """
+        Returns the If-None-Match / If-Modified-Since headers revalidating this response.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """
+    Content-addressed on-disk cache of raw HTTP response bodies.
+
+    Bodies are gzip-compressed and stored once per content hash under objects/, so
+    identical pages reached through different URLs share one file. A small JSON entry
+    per URL under entries/ points at the body and keeps its ETag and Last-Modified
+    validators. Reading an object bumps its mtime; when objects and entries outgrow
+    `max_size` bytes the least recently used objects are evicted together with the
+    entries pointing at them. Files are written to a temporary name and renamed into
+    place, so several processes can share a cache.
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        """
+        Parameters:
+            directory (str): The cache directory, created if needed.
+            max_size (int, optional): Maximum total size of the compressed bodies and entries in bytes.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.entries_dir = os.path.join(directory, 'entries')
+        self.lock = threading.Lock()
+        self._size = None
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, base, digest, suffix):
+        return os.path.join(base, digest[:2], digest + suffix)
+
+    def _entry_path(self, url):
+        return self._path(self.entries_dir, self._digest(url.encode('utf-8')), '.json')
+
+    def _object_path(self, digest):
+        return self._path(self.objects_dir, digest, '.gz')
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_entry(self, url):
+        try:
+            with open(self._entry_path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url):
+        """
+        Returns the cached response for the URL, however old, or None.
+
+        Parameters:
+            url (str): The requested URL.
+
+        Returns:
+            CachedResponse or None: The cached response, or None if the URL is not
+                cached or its body has been evicted.
+        """
+        entry = self._read_entry(url)
+        if entry is None:
+            return None
+        object_path = self._object_path(entry['object'])
+        try:
+            with open(object_path, 'rb') as f:
+                body = gzip.decompress(f.read())
+            os.utime(object_path)
+        except (OSError, EOFError, gzip.BadGzipFile):
+            return None
+        return CachedResponse(
+            url,
+            body,
+            encoding=entry.get('encoding'),
+            etag=entry.get('etag'),
+            last_modified=entry.get('last_modified'),
+            stored_at=entry.get('stored_at', 0.0),
+        )
+
+    def responses(self):
+        """
+        Yields every cached response whose body is still stored, e.g. to replay pages offline.
+        """
+        for root, _, files in os.walk(self.entries_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(root, name), encoding='utf-8') as f:
+                        url = json.load(f)['url']
+                except (OSError, ValueError, KeyError):
+                    continue
+                cached = self.get(url)
+                if cached is not None:
+                    yield cached
+
+    def store(self, url, body, encoding=None, etag=None, last_modified=None):
+        """
+        Stores a response body and its validators for the URL.
+
+        Returns:
+            CachedResponse: The stored response.
+        """
+        digest = self._digest(body)
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            compressed = gzip.compress(body, compresslevel=6)
+            self._write(object_path, compressed)
+            self._grow(len(compressed))
+        else:
+            os.utime(object_path)
+        cached = CachedResponse(url, body, encoding, etag, last_modified, time.time())
+        new_entry = not os.path.exists(self._entry_path(url))
+        entry_size = self._write_entry(cached, digest)
+        if new_entry:
+            self._grow(entry_size)
+        return cached
+
+    def revalidated(self, cached):
+        """
+        Marks a cached response as fresh again after the server answered 304 Not Modified.
+        """
+        cached.stored_at = time.time()
+        self._write_entry(cached, self._digest(cached.body))
+        return cached
+
+    def _write_entry(self, cached, digest):
+        entry = {
+            'url': cached.url,
+            'object': digest,
+            'encoding': cached.encoding,
+            'etag': cached.etag,
+            'last_modified': cached.last_modified,
+            'stored_at': cached.stored_at,
+        }
+        data = json.dumps(entry).encode('utf-8')
+        self._write(self._entry_path(cached.url), data)
+        return len(data)
+
+    @staticmethod
+    def _scan(base):
+        """
+        Returns (mtime, size, path) for every file under `base`, skipping files being written.
+        """
+        files = []
+        for root, _, names in os.walk(base):
+            for name in names:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_entries(self):
+        """
+        Returns the entries grouped by the digest of the object they point at, as
+        lists of (size, path); unreadable entries are grouped under None.
+        """
+        entries = {}
+        for _, size, path in self._scan(self.entries_dir):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    digest = json.load(f)['object']
+            except (OSError, ValueError, KeyError):
+                digest = None
+            entries.setdefault(digest, []).append((size, path))
+        return entries
+
+    def _grow(self, size):
+        with self.lock:
+            if self._size is None:
+                files = self._scan(self.objects_dir) + self._scan(self.entries_dir)
+                self._size = sum(file_size for _, file_size, _ in files)
+            else:
+                self._size += size
+            if self._size > self.max_size:
+                self._size = self._evict()
+
+    def _remove(self, paths_and_sizes):
+        removed = 0
+        for size, path in paths_and_sizes:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += size
+        return removed
+
+    def _evict(self):
+        """
+        Deletes the least recently used bodies, and the entries pointing at them, until
+        the cache is below 90% of its size cap. Entries whose body is already gone are
+        deleted first.
+
+        Returns:
+            int: The remaining size in bytes.
+        """
+        objects = sorted(self._scan(self.objects_dir))
+        entries = self._scan_entries()
+        size = sum(object_size for _, object_size, _ in objects)
+        size += sum(entry_size for group in entries.values() for entry_size, _ in group)
+        live = {os.path.basename(path)[:-len('.gz')] for _, _, path in objects}
+        for digest in set(entries) - live:
+            size -= self._remove(entries.pop(digest))
+        target = self.max_size * 0.9
+        evicted = 0
+        for _, object_size, path in objects:
+            if size <= target:
+                break
+            size -= self._remove([(object_size, path)])
+            size -= self._remove(entries.pop(os.path.basename(path)[:-len('.gz')], []))
+            evicted += 1
+        logging.info(f"HTTP cache: evicted {evicted} responses, {size} bytes left")
+        return size
+
+    def clear(self):
+        """
+        Deletes every cached response.
+        """
+        with self.lock:
+            for base in (self.objects_dir, self.entries_dir):
+                for root, _, files in os.walk(base):
+                    for name in files:
+                        os.remove(os.path.join(root, name))
+            self._size = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_http_cache(directory, max_size=256 * 1024 * 1024):
+    """
+    Returns the shared HTTPCache for the given directory.
+
+    Parameters:
+        directory (str): The cache directory. When empty, caching is disabled.
+        max_size (int, optional): Maximum total size of the cached bodies in bytes.
+
+    Returns:
+        HTTPCache or None: The cache, created on first use, or None if disabled.
+    """
+    if not directory:
+        return None
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = HTTPCache(directory, max_size)
+            _caches[directory] = cache
+        return cache
@@ -0,0 +1,117 @@
+import re
+from lxml import etree
+from lxml import html as lxml_html
+from cssselect import HTMLTranslator
+
+HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+_translator = HTMLTranslator()
+
+
+def parse_document(html_text):
+    """
+    Parses an HTML document with lxml.
+
+    Parameters:
+        html_text (str or bytes): The HTML document.
+
+    Returns:
+        lxml.html.HtmlElement: The root element of the document.
+    """
+    if isinstance(html_text, str):
+        html_text = html_text.encode('utf-8')
+    return lxml_html.fromstring(html_text, parser=HTML_PARSER)
+
+
+def compile_css(selector, first=False):
+    """
+    Compiles a CSS selector into an XPath evaluator, relative to the context element.
+
+    Parameters:
+        selector (str): The CSS selector.
+        first (bool, optional): Only return the first match in document order.
+
+    Returns:
+        lxml.etree.XPath: The compiled selector.
+    """
+    expression = _translator.css_to_xpath(selector, prefix='descendant::')
+    if first:
+        expression = f"({expression})[1]"
+    return etree.XPath(expression)
+
+
+class FieldSelector:
+    """
+    A compiled selector returning the text or an attribute of its first match.
+
+    An optional regular expression post-processes the value: without `format` the
+    whole match is returned, with it the match's groups are substituted into the
+    format string ("{1}/{2}"). A value the pattern does not match becomes None.
+    """
+
+    def __init__(self, selector, attr=None, pattern=None, format=None):
+        self.selector = selector
+        self.attr = attr
+        self.xpath = compile_css(selector, first=True)
+        self.pattern = re.compile(pattern) if pattern else None
+        self.format = format
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Builds a FieldSelector from a field spec of a site definition: a CSS selector
+        (the text of the first match), a (selector, attribute) tuple, or a dict with
+        'css' and optionally 'attr', 'pattern' and 'format'.
+        """
+        if isinstance(spec, str):
+            return cls(spec)
+        if isinstance(spec, (tuple, list)):
+            return cls(*spec)
+        return cls(spec['css'], spec.get('attr'), spec.get('pattern'), spec.get('format'))
+
+    def __call__(self, element):
+        matches = self.xpath(element)
+        if not matches:
+            return None
+        if self.attr:
+            value = matches[0].get(self.attr)
+        else:
+            value = matches[0].text_content()
+        if self.pattern is None or value is None:
+            return value
+        match = self.pattern.search(value)
+        if not match:
+            return None
+        return self.format.format(match.group(0), *match.groups()) if self.format else match.group(0)
+
+
+class CompiledSelectors:
+    """
+    The compiled item, field and pagination selectors of one site.
+
+    Each selector is translated to XPath and compiled once; extracting an item then
+    evaluates every field selector exactly once against the item element.
+    """
+
+    def __init__(self, item_selector, fields, next_page_selector=None):
+        """
+        Parameters:
+            item_selector (str): CSS selector matching one result item.
+            fields (dict): Field name -> field spec, see FieldSelector.from_spec().
+            next_page_selector (str, optional): CSS selector of the "next page" link.
+        """
+        self.items = compile_css(item_selector)
+        self.fields = [(name, FieldSelector.from_spec(spec)) for name, spec in fields.items()]
+        self.next_page = FieldSelector(next_page_selector, 'href') if next_page_selector else None
+
+    def extract(self, item):
+        """
+        Returns a dict with the raw value of every field for one item element.
+        """
+        return {name: selector(item) for name, selector in self.fields}
+
+    def next_page_url(self, root):
+        """
+        Returns the raw href of the "next page" link, or None.
+        """
+        return self.next_page(root) if self.next_page else None
@@ -0,0 +1,136 @@
+"""
+Process pool for the CPU-bound stage of scraping.
+
+Fetching is I/O bound and stays in threads, but lxml parsing, field extraction and
+VADER scoring hold the GIL, so in threads they never use more than one core. When
+SCRAPER_PARSE_WORKERS is set, fetched pages are handed to a ProcessPoolExecutor of
+parser processes that return plain product dicts; the calling process keeps doing
+all database writes.
+
+Stage timings recorded in a parser process are sent back with its results and
+recorded again in the calling process, where /metrics and the job summaries see them.
+"""
+import asyncio
+import atexit
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from ..metrics import ITEMS, UNCHANGED_ITEMS, collect_stages, observe_stage
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Scraper instances of a parser process, one per scraper class.
+_scrapers = {}
+
+
+def _init_worker(settings_module):
+    """
+    Sets up Django in a freshly spawned parser process and warms up the sentiment analyzer.
+    """
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    from .utils import get_analyzer
+    get_analyzer()
+
+
+def _get_scraper(scraper_path):
+    scraper = _scrapers.get(scraper_path)
+    if scraper is None:
+        module_name, class_name = scraper_path
+        Scraper = getattr(importlib.import_module(module_name), class_name)
+        scraper = Scraper(Scraper.HOME_URL)
+        _scrapers[scraper_path] = scraper
+    return scraper
+
+
+def parse_in_worker(scraper_path, html_text, known=None):
+    """
+    Parses one results page inside a parser process.
+
+    Parameters:
+        scraper_path (tuple): Module and class name of the scraper.
+        html_text (str): The fetched HTML.
+        known (dict, optional): Stored fingerprints, see BaseScraper.load_fingerprints().
+
+    Returns:
+        tuple: The product dicts and next page URL of the page, and the stage timings
+            of the parse as (site, stage, seconds) tuples.
+    """
+    with collect_stages() as stats:
+        result = _get_scraper(scraper_path).parse_page(html_text, known)
+    return result, stats.observations
+
+
+def get_parser_pool():
+    """
+    Returns the shared pool of parser processes, or None if SCRAPER_PARSE_WORKERS is 0.
+
+    Workers are spawned rather than forked: the web and job worker processes run
+    threads, and forking those can deadlock on locks held at fork time.
+    """
+    global _pool
+    workers = getattr(settings, 'SCRAPER_PARSE_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'ecommerce_scraping.settings'),),
+            )
+        return _pool
+
+
+def shutdown_parser_pool(wait=True):
+    """
+    Stops the parser processes; the next get_parser_pool() call starts new ones.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+atexit.register(shutdown_parser_pool, wait=False)
+
+
+async def parse_page(scraper, html_text, known=None):
+    """
+    Parses a fetched page in the parser pool, or in a thread when the pool is disabled.
+
+    Parameters:
+        scraper (BaseScraper): The scraper the page was fetched with.
+        html_text (str): The fetched HTML.
+        known (dict, optional): Stored fingerprints, see BaseScraper.load_fingerprints().
+
+    Returns:
+        tuple: The product dicts of the page and the next page URL.
+    """
+    pool = get_parser_pool()
+    result = None
+    if pool is not None:
+        scraper_path = (type(scraper).__module__, type(scraper).__name__)
+        try:
+            result, observations = await asyncio.get_running_loop().run_in_executor(
+                pool, parse_in_worker, scraper_path, html_text, known
+            )
+            for observation in observations:
+                observe_stage(*observation)
+        except BrokenProcessPool:
+            logging.error("A parser process died; restarting the pool and parsing in a thread")
+            shutdown_parser_pool(wait=False)
+    if result is None:
+        result = await asyncio.to_thread(scraper.parse_page, html_text, known)
+    ITEMS.inc(len(result[0]), site=scraper.website_name)
+    UNCHANGED_ITEMS.inc(sum(product['unchanged'] for product in result[0]), site=scraper.website_name)
+    return result
@@ -0,0 +1,122 @@
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are only shared between threads
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Callers reserve a token and sleep until it becomes available, so concurrent
+    callers are served in arrival order at `rate` requests per second, with at most
+    `capacity` requests let through back to back. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes one token and returns how many seconds the caller has to wait for it.
+        """
+        with self.lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        """
+        Blocks until a token is available.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a file, so that every process on the machine
+    (runserver threads, job workers, parser pools) draws from the same bucket.
+    """
+
+    def __init__(self, path, rate, capacity=1):
+        super().__init__(rate, capacity)
+        self.path = path
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0.0
+        with self.lock, open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    tokens, updated_at = (float(value) for value in f.read().split())
+                except ValueError:
+                    tokens, updated_at = self.capacity, time.time()
+                now = time.time()
+                tokens = min(self.capacity, tokens + (now - updated_at) * self.rate) - 1
+                f.seek(0)
+                f.truncate()
+                f.write(f"{tokens} {now}")
+                f.flush()
+                return max(0.0, -tokens / self.rate)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(host, rate, capacity=1, directory=None):
+    """
+    Returns the token bucket limiting requests to the given host.
+
+    Parameters:
+        host (str): The host name the bucket applies to.
+        rate (float): Allowed requests per second; 0 disables the limit.
+        capacity (int, optional): Burst size. Defaults to 1.
+        directory (str, optional): Directory for cross-process bucket files. When not
+            given (or on platforms without fcntl) the bucket is shared by threads only.
+
+    Returns:
+        TokenBucket: The bucket for the host, created on first use. Its rate and
+            capacity follow the latest call, so changed settings apply at once.
+    """
+    with _buckets_lock:
+        bucket = _buckets.get((host, directory))
+        if bucket is not None:
+            with bucket.lock:
+                bucket.rate = float(rate)
+                bucket.capacity = float(capacity)
+        else:
+            if directory and fcntl is not None:
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, re.sub(r'[^\w.-]', '_', host) + '.bucket')
+                bucket = FileTokenBucket(path, rate, capacity)
+            else:
+                if directory:
+                    logging.warning("fcntl is not available, rate limits are only shared between threads")
+                bucket = TokenBucket(rate, capacity)
+            _buckets[(host, directory)] = bucket
+        return bucket
@@ -0,0 +1,221 @@
+"""
+Declarative site definitions.
+
+Every site the scrapers support is a dict in SITES; its scraper class is built from
+it by build_scraper(), so adding a site needs no code:
+
+    {
+        'name': 'Example',                                 # Website.name of its products
+        'home_url': 'https://www.example.com/',            # Base of relative links
+        'search_url': 'https://www.example.com/search?q={keyword}',
+        'page_param': 'page',                              # Query parameter of the page number
+        'item': '.result',                                 # CSS selector of one search result
+        'fields': {                                        # One spec per product field
+            'name': '.title',                              # Text of the first match
+            'price': '.price',
+            'reviews': {'css': '.stars', 'attr': 'aria-label',
+                        'pattern': r'(\\d) of (\\d)', 'format': '{1}/{2}'},
+            'product_url': {'css': 'a.title', 'attr': 'href'},
+            'image_url': {'css': 'img', 'attr': 'src'},
+        },
+        'next_page': 'a.next',                             # Optional "next page" link
+        'product_id': r'/item/(\\d+)',                     # Optional item id in product URLs
+        'currency': 'USD',                                 # Currency of prices without a symbol
+        'default_reviews': None,                           # Stored when an item has no reviews
+        'requests_per_second': 1.0,                        # Default rate limit
+    }
+
+A field spec's `pattern` is a regular expression applied to the value (the whole
+match is kept, or the groups are substituted into `format`); see
+parsing.FieldSelector. `product_id` is a regular expression whose first group is
+the site's item id in a product URL; products are stored once per item id, or per
+normalized URL for sites without one (see BaseScraper.product_key). More sites, or replacements of the built-in ones by name,
+can be listed in the YAML or JSON file named by SCRAPER_SITES_FILE (YAML needs
+PyYAML), either as a list of definitions or under a `sites` key.
+"""
+import json
+import re
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .BaseScraper import BaseScraper
+from .parsing import FieldSelector
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+FIELDS = ('name', 'price', 'reviews', 'product_url', 'image_url')
+
+SITES = [
+    {
+        'name': 'Amazon',
+        'home_url': 'https://www.amazon.com/',
+        'search_url': 'https://www.amazon.com/s?k={keyword}',
+        'item': '.s-result-item',
+        'fields': {
+            'name': 'h2 a span',
+            'price': '.a-price-whole',
+            'reviews': '.a-size-base',
+            'product_url': {'css': 'h2 a', 'attr': 'href'},
+            'image_url': {'css': 'img.s-image', 'attr': 'src'},
+        },
+        'next_page': '.s-pagination-next',
+        'product_id': r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})',
+    },
+    {
+        'name': 'Ebay',
+        'home_url': 'https://www.ebay.com/',
+        'search_url': 'https://www.ebay.com/sch/i.html?_nkw={keyword}',
+        'page_param': '_pgn',
+        'item': '.s-item',
+        'fields': {
+            'name': 'div.s-item__title',
+            'price': '.s-item__price',
+            'reviews': '.s-item__reviews-count span',
+            'product_url': {'css': 'a.s-item__link', 'attr': 'href'},
+            'image_url': {'css': 'div.s-item__image-wrapper img', 'attr': 'src'},
+        },
+        'next_page': '.pagination__next',
+        'product_id': r'/itm/(?:[^/?#]+/)?(\d{9,})',
+        'default_reviews': "No reviews available",
+    },
+    {
+        'name': 'Newegg',
+        'home_url': 'https://www.newegg.com/',
+        'search_url': 'https://www.newegg.com/p/pl?d={keyword}',
+        'item': '.item-cell',
+        'fields': {
+            'name': '.item-title',
+            'price': '.price-current',
+            # The rating icon's "rated X out of Y" label, stored as "X/Y".
+            'reviews': {'css': '.item-rating i', 'attr': 'aria-label', 'pattern': r'rated (\d) out of (\d)', 'format': '{1}/{2}'},
+            'product_url': {'css': '.item-title', 'attr': 'href'},
+            'image_url': {'css': '.item-img img', 'attr': 'src'},
+        },
+        'next_page': '.list-tool-pagination .btn-group-cell a[title="Next"]',
+        'product_id': r'/p/([0-9A-Z]{2,}(?:-[0-9A-Z]+)*)',
+    },
+]
+
+# Definition key -> BaseScraper class attribute.
+ATTRIBUTES = {
+    'name': 'website_name',
+    'home_url': 'HOME_URL',
+    'search_url': 'SEARCH_URL',
+    'page_param': 'PAGE_PARAM',
+    'item': 'ITEM_SELECTOR',
+    'fields': 'FIELDS',
+    'next_page': 'NEXT_PAGE_SELECTOR',
+    'currency': 'CURRENCY',
+    'default_reviews': 'DEFAULT_REVIEWS',
+    'requests_per_second': 'REQUESTS_PER_SECOND',
+    'product_id': 'PRODUCT_ID_PATTERN',
+}
+REQUIRED = ('name', 'home_url', 'search_url', 'item', 'fields')
+
+
+def validate_site(definition):
+    """
+    Checks a site definition and compiles its selectors once.
+
+    Raises:
+        ImproperlyConfigured: If a key is missing or unknown, or a selector is invalid.
+    """
+    name = definition.get('name', '<unnamed>')
+    missing = [key for key in REQUIRED if not definition.get(key)]
+    if missing:
+        raise ImproperlyConfigured(f"Site '{name}' is missing {', '.join(missing)}")
+    unknown = set(definition) - set(ATTRIBUTES)
+    if unknown:
+        raise ImproperlyConfigured(f"Site '{name}' has unknown keys: {', '.join(sorted(unknown))}")
+    if '{keyword}' not in definition['search_url']:
+        raise ImproperlyConfigured(f"Site '{name}': search_url must contain {{keyword}}")
+    missing_fields = [field for field in FIELDS if field not in definition['fields']]
+    if missing_fields:
+        raise ImproperlyConfigured(f"Site '{name}' has no selector for {', '.join(missing_fields)}")
+    try:
+        for spec in definition['fields'].values():
+            FieldSelector.from_spec(spec)
+        FieldSelector(definition['item'])
+        if definition.get('next_page'):
+            FieldSelector(definition['next_page'])
+    except Exception as e:
+        raise ImproperlyConfigured(f"Site '{name}' has an invalid selector: {str(e)}")
+    if definition.get('product_id'):
+        try:
+            groups = re.compile(definition['product_id']).groups
+        except re.error as e:
+            raise ImproperlyConfigured(f"Site '{name}' has an invalid product_id pattern: {str(e)}")
+        if not groups:
+            raise ImproperlyConfigured(f"Site '{name}': product_id must capture the item id in a group")
+
+
+def load_sites_file(path):
+    """
+    Reads site definitions from a YAML or JSON file.
+
+    Returns:
+        list: The site definitions of the file.
+
+    Raises:
+        ImproperlyConfigured: If the file cannot be read or parsed, or does not hold a
+            list of site definitions.
+    """
+    is_yaml = path.endswith(('.yaml', '.yml'))
+    if is_yaml and yaml is None:
+        raise ImproperlyConfigured(f"PyYAML is required to read {path}")
+    parse_errors = (OSError, ValueError, yaml.YAMLError) if yaml else (OSError, ValueError)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = yaml.safe_load(f) if is_yaml else json.load(f)
+    except parse_errors as e:
+        raise ImproperlyConfigured(f"Cannot read SCRAPER_SITES_FILE {path}: {str(e)}")
+    if isinstance(data, dict):
+        data = data.get('sites', [])
+    if not isinstance(data, list) or not all(isinstance(site, dict) for site in data):
+        raise ImproperlyConfigured(f"{path} must contain a list of site definitions")
+    return data
+
+
+def get_site_definitions():
+    """
+    Returns the built-in sites followed by those of SCRAPER_SITES_FILE; a file entry
+    with the name of a built-in site replaces it.
+    """
+    sites = {site['name']: site for site in SITES}
+    path = getattr(settings, 'SCRAPER_SITES_FILE', None)
+    if path:
+        for site in load_sites_file(path):
+            sites[site.get('name')] = site
+    return list(sites.values())
+
+
+def product_key(website_name, url):
+    """
+    Returns the product key of a URL of the named website (see BaseScraper.product_key);
+    websites without a site definition are keyed by canonical URL.
+    """
+    return SCRAPERS_BY_NAME.get(website_name, BaseScraper).product_key(url)
+
+
+def build_scraper(definition):
+    """
+    Builds the scraper class of a site definition.
+
+    Returns:
+        type: A BaseScraper subclass named after the site, e.g. AmazonScraper.
+    """
+    validate_site(definition)
+    attributes = {ATTRIBUTES[key]: value for key, value in definition.items()}
+    attributes['__module__'] = __name__
+    attributes['__doc__'] = f"Scrapes product listings from {definition['name']} search result pages."
+    return type(f"{re.sub(r'[^0-9A-Za-z_]', '', definition['name'])}Scraper", (BaseScraper,), attributes)
+
+
+SCRAPERS = [build_scraper(definition) for definition in get_site_definitions()]
+
+SCRAPERS_BY_NAME = {Scraper.website_name: Scraper for Scraper in SCRAPERS}
+
+# The classes are module attributes so parser processes can import them by name.
+globals().update({Scraper.__name__: Scraper for Scraper in SCRAPERS})
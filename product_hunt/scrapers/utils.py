@@ -1,6 +1,44 @@
 from textblob import TextBlob
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from decimal import Decimal, InvalidOperation
 import re
+import threading
+
+CURRENCY_SYMBOLS = {
+    '$': 'USD',
+    'US $': 'USD',
+    'C $': 'CAD',
+    'AU $': 'AUD',
+    '£': 'GBP',
+    '€': 'EUR',
+    '¥': 'JPY',
+    '₹': 'INR',
+}
+_price_re = re.compile(r'(?P<symbol>(?:[A-Z]{1,2} ?)?[$£€¥₹]|[A-Z]{3})?\s*(?P<amount>\d[\d,]*(?:\.\d*)?|\.\d+)')
+
+NEUTRAL_SENTIMENT = {
+    'reviews': None,
+    'sentiment_score': 0.0,
+    'sentiment_label': 'Neutral'
+}
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    """
+    Returns the shared VADER analyzer, loading its lexicon on first use only.
+
+    Scoring does not modify the analyzer, so one instance serves every thread.
+    """
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
 
 def sentiment_score(review):
     """_summary_ sentences_polarity( sentences, sentence_polarity):
@@ -11,10 +49,51 @@ def sentiment_score(review):
     Returns:
         _type_: The polarity of the text in form of percentage.
     """
-    analyzer = SentimentIntensityAnalyzer()
+    analyzer = get_analyzer()
     score = analyzer.polarity_scores(review)
     return score
 
+
+def sentiment_scores(reviews):
+    """
+    Scores a batch of texts with the shared analyzer.
+
+    Args:
+        reviews (iterable): The texts to be analyzed.
+
+    Returns:
+        list: The polarity scores of each text, in the same order.
+    """
+    polarity_scores = get_analyzer().polarity_scores
+    return [polarity_scores(review) for review in reviews]
+
+
+def review_sentiments(reviews):
+    """
+    Computes the stored sentiment fields for a batch of reviews.
+
+    Args:
+        reviews (list): The reviews text of each product (None or empty when there is none).
+
+    Returns:
+        list: For each product, a dictionary containing the reviews, sentiment score, and sentiment label.
+            Products without reviews get NEUTRAL_SENTIMENT.
+    """
+    scores = iter(sentiment_scores([review for review in reviews if review]))
+    review_data = []
+    for review in reviews:
+        if not review:
+            review_data.append(dict(NEUTRAL_SENTIMENT))
+            continue
+        score = next(scores)
+        review_data.append({
+            'reviews': review,
+            'sentiment_score': score['compound'],
+            'sentiment_label': sentiment_label(score)
+        })
+    return review_data
+
+
 def sentiment_label(score, **kwargs):
     if score['compound'] < -0.7:
         return "Critical"
@@ -28,4 +107,29 @@ def sentiment_label(score, **kwargs):
         return "Positive"
     elif score['compound'] > 0.3 and score['compound'] <= 0.5:
         return "Slightly Positive"
-    
\ No newline at end of file
+    
+
+def parse_price(text, default_currency='USD'):
+    """
+    Parses a scraped price string into a number and a currency code.
+
+    Thousands separators are dropped and only the first amount is used, so price
+    ranges such as "$19.99 to $29.99" give their lower bound.
+
+    Args:
+        text (str): The price as shown on the site, e.g. "$1,299.99" or "1,299.".
+        default_currency (str, optional): Currency used when the text has no symbol. Defaults to 'USD'.
+
+    Returns:
+        tuple: (Decimal or None, str) - the amount rounded to cents and the ISO currency code.
+    """
+    match = _price_re.search(text or '')
+    if not match:
+        return None, default_currency
+    symbol = (match.group('symbol') or '').strip()
+    currency = CURRENCY_SYMBOLS.get(symbol, symbol if len(symbol) == 3 and symbol.isalpha() else default_currency)
+    try:
+        amount = Decimal(match.group('amount').replace(',', '').rstrip('.') or '0')
+    except InvalidOperation:
+        return None, currency
+    return amount.quantize(Decimal('0.01')), currency
@@ -0,0 +1,205 @@
+"""
+Full-text search over Product names and keywords.
+
+SQLite uses an external-content FTS5 table kept in sync with product_hunt_product
+by triggers; PostgreSQL uses GIN indexes on to_tsvector() expressions. Both are
+created (or repaired) after every `migrate`, see ensure_search_index(). On other
+databases, or when FTS5 is not compiled in, searches fall back to icontains.
+
+Keyword lookups go through the product-keyword association instead, see
+keyword_filter().
+"""
+import logging
+import re
+from django.db import connections
+from django.db.models import BooleanField, Case, Exists, FloatField, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .models import Keyword, Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'product_hunt_product_fts'
+SEARCH_FIELDS = ('name', 'keyword')
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, keyword, content='product_hunt_product', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON product_hunt_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, keyword) VALUES (new.id, new.name, new.keyword);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON product_hunt_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, keyword) VALUES ('delete', old.id, old.name, old.keyword);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON product_hunt_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, keyword) VALUES ('delete', old.id, old.name, old.keyword);
+        INSERT INTO {FTS_TABLE}(rowid, name, keyword) VALUES (new.id, new.name, new.keyword);
+    END""",
+]
+SQLITE_TRIGGERS = {f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+
+POSTGRES_FTS_SQL = [
+    f"""CREATE INDEX IF NOT EXISTS product_hunt_product_{field}_fts
+        ON product_hunt_product USING gin (to_tsvector('simple', {field}))"""
+    for field in SEARCH_FIELDS
+]
+
+_fts_available = {}
+
+
+def search_terms(text):
+    """
+    Splits a search string into lower-case word tokens; everything else is dropped,
+    so the tokens are safe to embed in FTS query syntax.
+    """
+    return re.findall(r'\w+', text.lower())
+
+
+def normalize_keyword(keyword):
+    """
+    Returns the canonical form of a keyword: its search terms joined by single spaces.
+
+    Keywords with the same normal form ("iPhone  15", "iphone 15") find the same
+    products, so they share one scrape.
+    """
+    return ' '.join(search_terms(keyword))
+
+
+def ensure_search_index(using='default', rebuild=False):
+    """
+    Creates the full-text index if it is missing.
+
+    Migrations that rebuild product_hunt_product on SQLite drop its triggers, so this
+    runs after every `migrate` and re-populates the index whenever a trigger had to be
+    recreated.
+
+    Parameters:
+        using (str, optional): The database alias. Defaults to 'default'.
+        rebuild (bool, optional): Re-populate the SQLite index even if it looks intact.
+
+    Returns:
+        bool: Whether a full-text index is available on that database.
+    """
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            try:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+                rebuild = rebuild or not SQLITE_TRIGGERS <= {row[0] for row in cursor.fetchall()}
+                for statement in SQLITE_FTS_SQL:
+                    cursor.execute(statement)
+                if rebuild:
+                    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            except Exception as e:
+                logger.warning(f"SQLite full-text search is not available, falling back to icontains: {str(e)}")
+                _fts_available[using] = False
+                return False
+        elif conn.vendor == 'postgresql':
+            for statement in POSTGRES_FTS_SQL:
+                cursor.execute(statement)
+        else:
+            _fts_available[using] = False
+            return False
+    _fts_available[using] = True
+    return True
+
+
+def fts_available(using='default'):
+    """
+    Returns whether full-text search can be used on the given database.
+    """
+    if using not in _fts_available:
+        conn = connections[using]
+        if conn.vendor == 'sqlite':
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                _fts_available[using] = cursor.fetchone() is not None
+        else:
+            _fts_available[using] = conn.vendor == 'postgresql'
+    return _fts_available[using]
+
+
+def full_text_filter(queryset, field, text, rank=True):
+    """
+    Filters a Product queryset to rows whose `field` matches every word of `text`.
+
+    Words match as prefixes ("iph" finds "iPhone"). With rank=True the results are
+    ordered best match first (bm25 on SQLite, ts_rank on PostgreSQL) and carry a
+    `rank` annotation.
+
+    Parameters:
+        queryset (QuerySet): A Product queryset.
+        field (str): 'name' or 'keyword'.
+        text (str): The user's search string.
+        rank (bool, optional): Annotate and order by relevance. Defaults to True.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    if field not in SEARCH_FIELDS:
+        raise ValueError(f"Field '{field}' is not full-text indexed")
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+    if not fts_available(queryset.db):
+        return queryset.filter(**{f'{field}__icontains': text})
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        phrases = ' '.join(f'"{term}"*' for term in terms)
+        match = f"{field} : ({phrases})"
+        queryset = queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)
+        ))
+        if rank:
+            queryset = queryset.annotate(rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = product_hunt_product.id", (match,),
+                output_field=FloatField()
+            ))
+    else:
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        vector = f"to_tsvector('simple', product_hunt_product.{field})"
+        queryset = queryset.filter(RawSQL(
+            f"{vector} @@ to_tsquery('simple', %s)", (tsquery,), output_field=BooleanField()
+        ))
+        if rank:
+            queryset = queryset.annotate(rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField()
+            ))
+    return queryset.order_by('-rank', 'id') if rank else queryset
+
+
+def keyword_filter(queryset, text, rank=True):
+    """
+    Filters a Product queryset to the products found for a keyword matching `text`.
+
+    A keyword matches when every word of `text` is a prefix of one of its words, as
+    in full_text_filter(). The matching keywords are looked up in the small Keyword
+    table and their products selected through the indexed association table. With
+    rank=True the products found for exactly the normalized `text` come first, and
+    the results carry a `rank` annotation.
+
+    Parameters:
+        queryset (QuerySet): A Product queryset.
+        text (str): The user's keyword.
+        rank (bool, optional): Annotate and order by relevance. Defaults to True.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+    keywords = Keyword.objects.all()
+    for term in terms:
+        keywords = keywords.filter(Q(name__startswith=term) | Q(name__contains=f' {term}'))
+    links = Product.keywords.through.objects.filter(keyword__in=keywords)
+    queryset = queryset.filter(id__in=links.values('product_id'))
+    if not rank:
+        return queryset
+    exact = Product.keywords.through.objects.filter(product_id=OuterRef('id'), keyword__name=' '.join(terms))
+    queryset = queryset.annotate(rank=Case(
+        When(Exists(exact), then=Value(1.0)), default=Value(0.0), output_field=FloatField()
+    ))
+    return queryset.order_by('-rank', 'id')
@@ -1,13 +1,99 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Product, Website
+from .models import Product, ScrapeJob, Website
+
+
+class WebsiteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Website
+        fields = '__all__'
+
 
 class ProductSerializer(serializers.ModelSerializer):
+    website = WebsiteSerializer(read_only=True)
+
     class Meta:
         model = Product
-        fields = '__all__'
+        # Keyword lookups go through the association, and the product key and
+        # fingerprint are internal to the scrapers; none of them is product data.
+        exclude = ['keywords', 'product_key', 'fingerprint']
 
 
-class WebsiteSerializer(serializers.ModelSerializer):
+class ScrapeJobSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Website
-        fields = '__all__'
+        model = ScrapeJob
+        fields = ['id', 'keyword', 'sites', 'status', 'created_at', 'started_at', 'finished_at', 'products_count', 'error', 'stats']
+
+
+# Fast read-only path for product lists. ModelSerializer builds and runs a field
+# object per column per row; for long lists it is cheaper to fetch plain values()
+# rows (with the website joined in the same query) and convert only the columns
+# whose JSON representation differs from the database value.
+
+WEBSITE_VALUES = ('website__id', 'website__name', 'website__url')
+
+
+def _product_columns():
+    columns = []
+    for name, field in ProductSerializer().fields.items():
+        if name == 'website':
+            continue
+        if isinstance(field, (serializers.CharField, serializers.IntegerField, serializers.FloatField)):
+            columns.append((name, None))
+        else:
+            columns.append((name, field))
+    return columns
+
+
+PRODUCT_COLUMNS = _product_columns()
+
+
+def _converter(field):
+    if field is None:
+        return None
+    if isinstance(field, serializers.DateTimeField) and settings.USE_TZ:
+        # Resolve the current timezone once per list instead of once per value.
+        return serializers.DateTimeField(default_timezone=timezone.get_current_timezone()).to_representation
+    return field.to_representation
+
+
+def product_values(queryset):
+    """
+    Returns the queryset as values() rows holding everything serialize_product_rows() needs.
+
+    The full-text `rank` annotation is kept so the rows can still be keyset-paginated.
+    """
+    fields = [name for name, _ in PRODUCT_COLUMNS] + list(WEBSITE_VALUES)
+    if 'rank' in queryset.query.annotations:
+        fields.append('rank')
+    return queryset.values(*fields)
+
+
+def serialize_product_rows(rows):
+    """
+    Serializes product_values() rows exactly like ProductSerializer(many=True).
+
+    Parameters:
+        rows (iterable): Dicts from product_values().
+
+    Returns:
+        list: The product representations, with the website nested.
+    """
+    columns = [(name, _converter(field)) for name, field in PRODUCT_COLUMNS]
+    data = []
+    for row in rows:
+        product = {'id': row['id']}
+        product['website'] = {'id': row['website__id'], 'name': row['website__name'], 'url': row['website__url']}
+        for name, convert in columns:
+            value = row[name]
+            product[name] = convert(value) if convert is not None and value is not None else value
+        data.append(product)
+    return data
+
+
+def serialize_products(queryset):
+    """
+    Serializes a Product queryset with one query and no per-row serializer overhead.
+    """
+    return serialize_product_rows(product_values(queryset))
@@ -1,3 +1,827 @@
-from django.test import TestCase
+import asyncio
+import copy
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .apicache import get_cache, invalidate_all, invalidate_keyword
+from .benchmarks.stub import StubServer, stub_scraper
+from .dedupe import merge_duplicate_products
+from .management.commands.scrape_keywords import BatchWriter
+from .jobs import claim_next_job, enqueue_scrape, requeue_stale_jobs, run_job
+from .models import Keyword, Product, ScrapeJob, Website
+from .scrapers.BaseScraper import BaseScraper
+from .scrapers.engine import SCRAPERS, ScrapeEngine, SingleFlight
+from .scrapers import ratelimit
+from .scrapers.httpcache import HTTPCache
+from .scrapers.ratelimit import FileTokenBucket, TokenBucket, get_bucket
+from .scrapers.sites import SITES, build_scraper, get_site_definitions, load_sites_file, validate_site
+from .scrapers.utils import parse_price
+from . import search
+from .search import full_text_filter, normalize_keyword
+from .views import find_best_product
 
-# Create your tests here.
+
+def create_products(keyword, count, website_name='Amazon'):
+    """
+    Stores `count` products found for the keyword and returns them.
+    """
+    website, _ = Website.objects.get_or_create(name=website_name, defaults={'url': 'https://www.example.com/'})
+    linked, _ = Keyword.objects.get_or_create(name=normalize_keyword(keyword))
+    start = Product.objects.count()
+    products = [
+        Product.objects.create(
+            name=f"{keyword} {index}",
+            price=f"${index}.99",
+            reviews="Works fine",
+            product_url=f"https://www.example.com/item/{index}",
+            product_key=f"item-{index}",
+            image_url=f"https://www.example.com/item/{index}.jpg",
+            website=website,
+            keyword=keyword,
+            scraped_at=timezone.now(),
+        )
+        for index in range(start, start + count)
+    ]
+    linked.products.add(*products)
+    return products
+
+
+class StubSitesTestCase(TransactionTestCase):
+    """
+    Serves the saved result pages of the built-in sites on localhost, so scrapes run
+    offline against stub_scraper() subclasses in `self.scrapers`.
+
+    The engine saves from worker threads with their own database connections, so the
+    tests commit instead of running in a transaction.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer([Scraper.website_name for Scraper in SCRAPERS])
+        cls.server.__enter__()
+        cls.scrapers = [stub_scraper(Scraper, cls.server) for Scraper in SCRAPERS]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        get_cache().clear()
+
+
+@override_settings(SCRAPE_WORKER_THREADS=0, SCRAPER_MAX_PAGES=1)
+class ScrapeJobQueueTests(StubSitesTestCase):
+
+    def test_claim_next_job_takes_the_oldest_pending_job_once(self):
+        first = enqueue_scrape('laptop')
+        second = enqueue_scrape('monitor')
+        self.assertEqual(claim_next_job('worker-1').id, first.id)
+        self.assertEqual(claim_next_job('worker-2').id, second.id)
+        self.assertIsNone(claim_next_job('worker-3'))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker), (ScrapeJob.RUNNING, 'worker-1'))
+        self.assertIsNotNone(first.started_at)
+
+    def test_requeue_stale_jobs_only_requeues_timed_out_jobs(self):
+        stale = enqueue_scrape('laptop')
+        recent = enqueue_scrape('monitor')
+        claim_next_job('worker-1')
+        claim_next_job('worker-2')
+        ScrapeJob.objects.filter(id=stale.id).update(started_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((stale.status, stale.started_at, stale.worker), (ScrapeJob.PENDING, None, ''))
+        self.assertEqual(recent.status, ScrapeJob.RUNNING)
+        self.assertEqual(claim_next_job('worker-3').id, stale.id)
+
+    def test_scrape_and_store_queues_a_job_and_reports_it_until_done(self):
+        response = self.client.post(reverse('scrape_and_store'), {'keyword': 'laptop'}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], ScrapeJob.PENDING)
+
+        status = self.client.get(job['status_url']).json()
+        self.assertEqual((status['id'], status['status']), (job['id'], ScrapeJob.PENDING))
+
+        with mock.patch('product_hunt.jobs.get_scrapers', return_value=self.scrapers):
+            run_job(claim_next_job('worker-1'))
+        status = self.client.get(job['status_url']).json()
+        self.assertEqual(status['status'], ScrapeJob.DONE)
+        self.assertGreater(status['products_count'], 0)
+
+        products = self.client.get(status['products_url']).json()
+        self.assertTrue(products['results'])
+
+        # Stored and fresh: served at once, without a new job.
+        response = self.client.post(reverse('scrape_and_store'), {'keyword': 'laptop'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['results'], products['results'])
+
+    def test_scrape_job_status_of_unknown_job(self):
+        response = self.client.get(reverse('scrape_job_status', args=[12345]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SCRAPE_WORKER_THREADS=0)
+@override_settings(SCRAPE_WORKER_THREADS=0, SCRAPE_CACHE_TTL=60 * 60, SCRAPE_CACHE_TTLS={})
+class StaleSitesTests(TestCase):
+
+    def finished_job(self, sites, age):
+        finished_at = timezone.now() - age
+        return ScrapeJob.objects.create(
+            keyword='laptop', normalized_keyword='laptop', sites=sites, status=ScrapeJob.DONE, finished_at=finished_at,
+        )
+
+    def test_only_the_site_past_its_ttl_is_refreshed(self):
+        get_cache().clear()
+        create_products('laptop', 3)
+        self.finished_job(['Ebay'], timedelta(hours=2))
+        self.finished_job(['Amazon', 'Newegg'], timedelta(minutes=10))
+
+        response = self.client.post(reverse('scrape_and_store'), {'keyword': 'laptop'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(len(response.json()['results']), 3)
+
+        job = ScrapeJob.objects.get(status=ScrapeJob.PENDING)
+        self.assertEqual(job.sites, ['Ebay'])
+        self.assertTrue(response['X-Scrape-Job'].endswith(reverse('scrape_job_status', args=[job.id])))
+
+        # A second request while the refresh is queued joins the same job.
+        response = self.client.post(reverse('scrape_and_store'), {'keyword': 'laptop'}, content_type='application/json')
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(ScrapeJob.objects.filter(status=ScrapeJob.PENDING).count(), 1)
+
+
+class SingleFlightTests(TestCase):
+
+    def test_keywords_with_the_same_normal_form_share_one_job(self):
+        job = enqueue_scrape('iPhone  15')
+        self.assertEqual(enqueue_scrape('iphone 15').id, job.id)
+        self.assertEqual(enqueue_scrape(' IPHONE-15 ').id, job.id)
+        self.assertNotEqual(enqueue_scrape('iphone 14').id, job.id)
+
+        claim_next_job('worker-1')
+        self.assertEqual(enqueue_scrape('iphone 15').id, job.id)
+        ScrapeJob.objects.filter(id=job.id).update(status=ScrapeJob.DONE, finished_at=timezone.now())
+        self.assertNotEqual(enqueue_scrape('iphone 15').id, job.id)
+
+    def test_scrape_and_store_requests_join_the_active_job(self):
+        ids = {
+            self.client.post(reverse('scrape_and_store'), {'keyword': keyword}, content_type='application/json').json()['id']
+            for keyword in ('Gaming Laptop', 'gaming   laptop', 'gaming laptop!')
+        }
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(ScrapeJob.objects.count(), 1)
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+
+        async def scrape(keyword):
+            calls.append(keyword)
+            await asyncio.sleep(0.05)
+            return keyword.upper()
+
+        async def main():
+            flight = SingleFlight()
+            results = await asyncio.gather(*(flight.run('laptop', scrape, 'laptop') for _ in range(5)))
+            results.append(await flight.run('laptop', scrape, 'laptop'))
+            return results
+
+        self.assertEqual(asyncio.run(main()), ['LAPTOP'] * 6)
+        # Five concurrent callers, then one after the shared call had finished.
+        self.assertEqual(len(calls), 2)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        # Products of the exact keyword rank above those of keywords it prefixes.
+        self.products = create_products('laptop stand', 4) + create_products('laptop', 5)
+
+    def get_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            url = pages[-1]['next']
+        return pages
+
+    def test_following_next_links_returns_every_product_once(self):
+        pages = self.get_pages(f"{reverse('get_keyword_data')}?keyword=laptop&page_size=2")
+        ids = [product['id'] for page in pages for product in page['results']]
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertCountEqual(ids, [product.id for product in self.products])
+        self.assertEqual(ids[:5], sorted(product.id for product in self.products[4:]))
+
+    def test_previous_link_returns_the_previous_page(self):
+        pages = self.get_pages(f"{reverse('get_keyword_data')}?keyword=laptop&page_size=3")
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(pages[2]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_new_products_do_not_shift_the_pages(self):
+        url = f"{reverse('get_keyword_data')}?keyword=laptop&page_size=3"
+        first = self.client.get(url).json()
+        create_products('laptop', 2)
+        second = self.client.get(first['next']).json()
+        seen = {product['id'] for product in first['results']}
+        self.assertFalse(seen & {product['id'] for product in second['results']})
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', 'eyJwIjogWzFdfQ=='):
+            response = self.client.get(reverse('get_keyword_data'), {'keyword': 'laptop', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    @override_settings(SCRAPE_WORKER_THREADS=0, API_PAGE_SIZE=4)
+    def test_scrape_and_store_returns_the_first_page_with_links_to_get_keyword_data(self):
+        ScrapeJob.objects.create(
+            keyword='laptop', normalized_keyword='laptop', status=ScrapeJob.DONE, finished_at=timezone.now()
+        )
+        response = self.client.post(reverse('scrape_and_store'), {'keyword': 'laptop'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertIn(reverse('get_keyword_data'), data['next'])
+        ids = [product['id'] for page in [data] + self.get_pages(data['next']) for product in page['results']]
+        self.assertCountEqual(ids, [product.id for product in self.products])
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        create_products('gaming laptop', 2)
+        create_products('tv', 2)
+
+    def count(self, keyword):
+        return len(self.client.get(reverse('get_keyword_data'), {'keyword': keyword}).json()['results'])
+
+    def test_saving_a_keyword_invalidates_only_the_queries_it_can_change(self):
+        self.assertEqual((self.count('laptop'), self.count('gam lap'), self.count('tv')), (2, 2, 2))
+        create_products('gaming laptop', 1)
+        create_products('tv', 1)
+        # Written without invalidation: the cached responses are still served.
+        self.assertEqual((self.count('laptop'), self.count('tv')), (2, 2))
+
+        invalidate_keyword('gaming laptop')
+        self.assertEqual((self.count('laptop'), self.count('gam lap')), (3, 3))
+        self.assertEqual(self.count('tv'), 2)
+
+    def test_invalidate_all(self):
+        self.assertEqual(self.count('tv'), 2)
+        create_products('tv', 1)
+        invalidate_all()
+        self.assertEqual(self.count('tv'), 3)
+
+    def test_pages_are_cached_separately(self):
+        first = self.client.get(reverse('get_keyword_data'), {'keyword': 'laptop', 'page_size': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertNotEqual(first['results'], second['results'])
+
+
+@override_settings(SCRAPER_SKIP_UNCHANGED=True)
+class UnchangedProductTests(StubSitesTestCase):
+
+    def scrape(self, keyword):
+        engine = ScrapeEngine(scrapers=self.scrapers, max_pages=1)
+        asyncio.run(engine.scrape_keyword(keyword))
+        return engine.stats
+
+    def test_unchanged_products_are_not_scored_or_rewritten(self):
+        first = self.scrape('laptop')
+        self.assertGreater(first['items'], 0)
+        self.assertEqual(first['unchanged'], 0)
+        stored = Product.objects.count()
+        # A stored value the scrape would overwrite if it rewrote the rows.
+        Product.objects.update(sentiment_label='Kept', scraped_at=timezone.now() - timedelta(days=1))
+
+        scored = []
+        score_reviews = BaseScraper.score_reviews
+
+        def count_scored(scraper, reviews):
+            scored.extend(reviews)
+            return score_reviews(scraper, reviews)
+
+        with mock.patch.object(BaseScraper, 'score_reviews', count_scored):
+            second = self.scrape('laptop')
+        # Every stored product is recognized; only the placeholder rows the sites
+        # mix into their results (never stored) are scored again.
+        self.assertEqual(second['unchanged'], stored)
+        self.assertEqual(len(scored), second['items'] - second['unchanged'])
+        self.assertEqual(Product.objects.count(), stored)
+        self.assertFalse(Product.objects.exclude(sentiment_label='Kept').exists())
+        self.assertFalse(Product.objects.filter(scraped_at__lt=timezone.now() - timedelta(hours=1)).exists())
+
+    def test_changed_products_are_rewritten(self):
+        self.scrape('laptop')
+        stored = Product.objects.count()
+        product = Product.objects.order_by('id').first()
+        Product.objects.filter(id=product.id).update(fingerprint='stale', sentiment_label='Kept')
+
+        stats = self.scrape('laptop')
+        self.assertEqual(stats['unchanged'], stored - 1)
+        product.refresh_from_db()
+        self.assertNotEqual(product.sentiment_label, 'Kept')
+        self.assertNotEqual(product.fingerprint, 'stale')
+
+    @override_settings(SCRAPER_SKIP_UNCHANGED=False)
+    def test_skipping_can_be_turned_off(self):
+        self.scrape('laptop')
+        self.assertEqual(self.scrape('laptop')['unchanged'], 0)
+
+
+class CanonicalProductTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        website = Website.objects.create(name='Amazon', url='https://www.amazon.com/')
+        now = timezone.now()
+        # Stored under their URLs, as before Amazon products were keyed by ASIN.
+        rows = [
+            ('laptop', 'https://www.amazon.com/Some-Laptop/dp/B000000001?ref=sr_1_1', now - timedelta(days=1)),
+            ('gaming laptop', 'https://www.amazon.com/gp/product/B000000001', now),
+            ('laptop', 'https://www.amazon.com/Other-Laptop/dp/B000000002', now),
+        ]
+        for keyword, url, scraped_at in rows:
+            product = Product.objects.create(
+                name=keyword, price='$1', reviews='Good', product_url=url, product_key=url, image_url=url,
+                website=website, keyword=keyword, scraped_at=scraped_at,
+            )
+            Keyword.objects.get_or_create(name=keyword)[0].products.add(product)
+
+    def test_merge_keeps_the_newest_row_and_all_its_keywords(self):
+        self.assertEqual(merge_duplicate_products(Product), (2, 1))
+        self.assertEqual(Product.objects.count(), 2)
+        product = Product.objects.get(product_key='B000000001')
+        self.assertEqual(product.product_url, 'https://www.amazon.com/gp/product/B000000001')
+        self.assertCountEqual(product.keywords.values_list('name', flat=True), ['laptop', 'gaming laptop'])
+        for keyword, expected in (('laptop', 2), ('gaming laptop', 1)):
+            response = self.client.get(reverse('get_keyword_data'), {'keyword': keyword})
+            self.assertEqual(len(response.json()['results']), expected)
+
+    def test_dry_run_changes_nothing(self):
+        self.assertEqual(merge_duplicate_products(Product, dry_run=True), (2, 1))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertFalse(Product.objects.filter(product_key='B000000001').exists())
+
+    def test_dedupe_products_command(self):
+        call_command('dedupe_products', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Product.objects.values_list('product_key', flat=True)), ['B000000001', 'B000000002']
+        )
+        # Running it again finds nothing left to merge.
+        self.assertEqual(merge_duplicate_products(Product), (0, 0))
+
+
+@override_settings(SCRAPE_WORKER_THREADS=0)
+class SharedProductTests(StubSitesTestCase):
+
+    def test_a_product_found_for_two_keywords_is_stored_once(self):
+        engine = ScrapeEngine(scrapers=self.scrapers, max_pages=1)
+        asyncio.run(engine.scrape_keyword('laptop'))
+        stored = Product.objects.count()
+        asyncio.run(engine.scrape_keyword('Notebook'))
+
+        self.assertEqual(Product.objects.count(), stored)
+        self.assertFalse(Product.objects.exclude(keywords__name='laptop').exists())
+        self.assertFalse(Product.objects.exclude(keywords__name='notebook').exists())
+        for keyword in ('laptop', 'notebook'):
+            response = self.client.get(reverse('get_keyword_data'), {'keyword': keyword, 'page_size': 1000})
+            self.assertEqual(len(response.json()['results']), stored)
+
+
+@override_settings(SCRAPE_WORKER_THREADS=0)
+class SharedProductCacheTests(StubSitesTestCase):
+    """
+    A product linked to several keywords changes the responses of all of them.
+    """
+
+    def setUp(self):
+        super().setUp()
+        engine = ScrapeEngine(scrapers=self.scrapers, max_pages=1)
+        asyncio.run(engine.scrape_keyword('laptop'))
+        asyncio.run(engine.scrape_keyword('notebook'))
+        self.product = Product.objects.order_by('id').first()
+        # Pretend the stored row is outdated, so the next scrape rewrites it.
+        Product.objects.filter(id=self.product.id).update(price='$100.00', fingerprint='stale')
+
+    def notebook_price(self):
+        response = self.client.get(reverse('get_keyword_data'), {'keyword': 'notebook', 'page_size': 1000})
+        return {product['id']: product['price'] for product in response.json()['results']}[self.product.id]
+
+    def test_scrape_invalidates_every_keyword_of_a_written_product(self):
+        self.assertEqual(self.notebook_price(), '$100.00')
+        asyncio.run(ScrapeEngine(scrapers=self.scrapers, max_pages=1).scrape_keyword('laptop'))
+        self.assertEqual(self.notebook_price(), self.product.price)
+
+    def test_batch_writer_invalidates_every_keyword_of_a_written_product(self):
+        self.assertEqual(self.notebook_price(), '$100.00')
+        results = asyncio.run(ScrapeEngine(scrapers=self.scrapers, max_pages=1).scrape_keyword('laptop', save=False))
+        writer = BatchWriter(self.scrapers, batch_size=10000)
+        writer.add('laptop', results)
+        writer.flush()
+        self.assertEqual(self.notebook_price(), self.product.price)
+
+
+class PaginationTests(StubSitesTestCase):
+
+    def test_further_pages_follow_a_next_link(self):
+        engine = ScrapeEngine(scrapers=self.scrapers, max_pages=3)
+        asyncio.run(engine.scrape_keyword('laptop', save=False))
+        # Every saved first page links to page 2.
+        self.assertEqual(engine.stats['pages'], 3 * len(self.scrapers))
+
+    def test_single_page_results_fetch_only_page_one(self):
+        scrapers = [type(Scraper.__name__, (Scraper,), {'NEXT_PAGE_SELECTOR': 'a.no-such-link'}) for Scraper in self.scrapers]
+        engine = ScrapeEngine(scrapers=scrapers, max_pages=3)
+        results = asyncio.run(engine.scrape_keyword('laptop', save=False))
+        self.assertEqual(engine.stats['pages'], len(scrapers))
+        self.assertTrue(all(results.values()))
+
+
+class ScrapeKeywordsResumeTests(StubSitesTestCase):
+
+    def test_resume_scrapes_only_the_remaining_keywords(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'keywords.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("laptop\niPhone 15\n# accessories\ntablet\nLaptop\n")
+        # An earlier sweep was interrupted after its first keyword.
+        with open(f"{path}.done", 'w', encoding='utf-8') as f:
+            f.write("laptop\n")
+
+        scraped = []
+        scrape_keyword = ScrapeEngine.scrape_keyword
+
+        async def record(engine, keyword, **kwargs):
+            scraped.append(keyword)
+            return await scrape_keyword(engine, keyword, **kwargs)
+
+        out = io.StringIO()
+        with mock.patch('product_hunt.management.commands.scrape_keywords.get_scrapers', return_value=self.scrapers), \
+                mock.patch.object(ScrapeEngine, 'scrape_keyword', autospec=True, side_effect=record):
+            call_command('scrape_keywords', path, '--max-pages', '1', stdout=out)
+            self.assertIn("2 of 3 keywords to scrape, 1 already done", out.getvalue())
+            self.assertEqual(sorted(scraped), ['iPhone 15', 'tablet'])
+            self.assertEqual(
+                set(Keyword.objects.filter(products__isnull=False).values_list('name', flat=True)), {'iphone 15', 'tablet'}
+            )
+            with open(f"{path}.done", encoding='utf-8') as f:
+                self.assertEqual(sorted(f.read().split('\n')), ['', 'iphone 15', 'laptop', 'tablet'])
+
+            # Once every keyword is recorded, a rerun has nothing left to scrape.
+            scraped.clear()
+            out = io.StringIO()
+            call_command('scrape_keywords', path, stdout=out)
+            self.assertIn("0 of 3 keywords to scrape, 3 already done", out.getvalue())
+            self.assertEqual(scraped, [])
+
+
+class ValidatingServer:
+    """
+    Serves one page with an ETag and Last-Modified, answering 304 to conditional
+    requests carrying either, and records the requests it receives.
+    """
+    body = b"<html><body>cached page</body></html>"
+    etag = '"v1"'
+    last_modified = 'Sat, 17 Oct 2026 12:00:00 GMT'
+
+    def __enter__(self):
+        server = self
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                if self.headers.get('If-None-Match') == server.etag or self.headers.get('If-Modified-Since') == server.last_modified:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(server.body)))
+                self.send_header('ETag', server.etag)
+                self.send_header('Last-Modified', server.last_modified)
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/search?q=laptop"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class HTTPCacheTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Each test gets its own cache instead of the shared one under the system tempdir.
+        settings = override_settings(SCRAPER_HTTP_CACHE_DIR=tmp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = tmp.name
+        self.server = ValidatingServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.scraper = type('CachedScraper', (SCRAPERS[0],), {'get_rate_limit': lambda self: 1e9}).for_keyword('laptop')
+
+    def test_fresh_hit_skips_the_network(self):
+        first = self.scraper.fetch_html(self.server.url)
+        second = self.scraper.fetch_html(self.server.url)
+        self.assertEqual(first, self.server.body.decode())
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(SCRAPER_HTTP_CACHE_MAX_AGE=0)
+    def test_not_modified_response_refreshes_the_entry(self):
+        self.scraper.fetch_html(self.server.url)
+        cache = self.scraper.get_http_cache()
+        stored_at = cache.get(self.server.url).stored_at
+        time.sleep(0.01)
+
+        self.assertEqual(self.scraper.fetch_html(self.server.url), self.server.body.decode())
+        self.assertEqual(len(self.server.requests), 2)
+        conditional = self.server.requests[1]
+        self.assertEqual(conditional.get('If-None-Match'), self.server.etag)
+        self.assertEqual(conditional.get('If-Modified-Since'), self.server.last_modified)
+        self.assertGreater(cache.get(self.server.url).stored_at, stored_at)
+
+    def test_least_recently_used_bodies_are_evicted_with_their_entries(self):
+        cache = HTTPCache(self.directory, max_size=64 * 1024)
+        urls = [f"https://www.example.com/page/{index}" for index in range(6)]
+        for url in urls[:4]:
+            cache.store(url, os.urandom(12 * 1024))
+            time.sleep(0.01)
+        # Reading the first page makes it the most recently used one.
+        self.assertIsNotNone(cache.get(urls[0]))
+        for url in urls[4:]:
+            time.sleep(0.01)
+            cache.store(url, os.urandom(12 * 1024))
+
+        on_disk = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(self.directory) for name in names
+        )
+        self.assertLessEqual(on_disk, cache.max_size)
+        self.assertEqual(cache._size, on_disk)
+        # The sixth page exceeded the cap: the two least recently used pages made room.
+        self.assertEqual([cache.get(url) is not None for url in urls], [True, False, False, True, True, True])
+        # No entry is left pointing at an evicted body.
+        self.assertEqual(len(list(cache.responses())), sum(1 for _, _, names in os.walk(cache.entries_dir) for _ in names))
+
+
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        buckets = mock.patch.dict(ratelimit._buckets, clear=True)
+        buckets.start()
+        self.addCleanup(buckets.stop)
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.01)
+        # Each further caller queues behind the previous one.
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.01)
+
+    def test_file_bucket_is_shared_between_instances(self):
+        path = os.path.join(self.directory, 'www.example.com.bucket')
+        first = FileTokenBucket(path, rate=10, capacity=1)
+        second = FileTokenBucket(path, rate=10, capacity=1)
+        self.assertEqual(first.reserve(), 0.0)
+        # The second instance (another process, in production) sees the spent token.
+        self.assertAlmostEqual(second.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(first.reserve(), 0.2, delta=0.01)
+
+    def test_zero_rate_disables_the_limit(self):
+        for bucket in (TokenBucket(0), FileTokenBucket(os.path.join(self.directory, 'zero.bucket'), 0)):
+            with self.subTest(bucket=type(bucket).__name__):
+                self.assertEqual([bucket.reserve() for _ in range(5)], [0.0] * 5)
+                self.assertEqual(bucket.acquire(), 0.0)
+
+    def test_get_bucket_follows_the_latest_rate(self):
+        for directory in (None, self.directory):
+            with self.subTest(directory=directory):
+                bucket = get_bucket('www.example.com', 1, directory=directory)
+                self.assertEqual(bucket.reserve(), 0.0)
+                self.assertAlmostEqual(bucket.reserve(), 1.0, delta=0.01)
+
+                # A changed setting applies to the existing bucket and its spent tokens.
+                faster = get_bucket('www.example.com', 10, capacity=1, directory=directory)
+                self.assertIs(faster, bucket)
+                self.assertEqual(faster.rate, 10.0)
+                self.assertAlmostEqual(faster.reserve(), 0.2, delta=0.05)
+                self.assertEqual(get_bucket('www.example.com', 0, directory=directory).reserve(), 0.0)
+
+        self.assertIsInstance(get_bucket('www.example.com', 1), TokenBucket)
+        self.assertIsInstance(get_bucket('www.example.com', 1, directory=self.directory), FileTokenBucket)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        website = Website.objects.create(name='Amazon', url='https://www.amazon.com/')
+        names = ["Anker USB C charging cable braided", "USB C cable", "Wireless mouse", "Braided USB cable"]
+        self.products = {
+            name: Product.objects.create(
+                name=name, price="$9.99", product_url=f"https://www.example.com/item/{index}",
+                product_key=f"item-{index}", website=website, keyword='cable', scraped_at=timezone.now(),
+            )
+            for index, name in enumerate(names)
+        }
+
+    def search(self, query):
+        return [product.name for product in full_text_filter(Product.objects.all(), 'name', query)]
+
+    def test_search_products_returns_matches_in_rank_order(self):
+        response = self.client.get(reverse('api_search_products'), {'query': 'usb cable'})
+        self.assertEqual(response.status_code, 200)
+        # The shortest name matching every term ranks first; the mouse does not match.
+        self.assertEqual(
+            [product['name'] for product in response.json()['products']],
+            ["USB C cable", "Braided USB cable", "Anker USB C charging cable braided"],
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        product = self.products["Wireless mouse"]
+        product.name = "Wireless keyboard"
+        product.save()
+        self.assertEqual(self.search('mouse'), [])
+        self.assertEqual(self.search('keyb'), ["Wireless keyboard"])
+
+        # Bulk updates, as used by the scrapers, go through the triggers as well.
+        Product.objects.filter(id=product.id).update(name="Wireless USB cable")
+        self.assertEqual(self.search('keyboard'), [])
+        self.assertIn("Wireless USB cable", self.search('usb cable'))
+
+        self.products["USB C cable"].delete()
+        self.assertNotIn("USB C cable", self.search('usb cable'))
+        self.assertEqual(len(self.search('usb cable')), 3)
+
+    def test_rebuild_search_index_restores_dropped_triggers(self):
+        # Migrations that rebuild the products table on SQLite drop its triggers.
+        with connection.cursor() as cursor:
+            for trigger in search.SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {trigger}")
+        product = self.products["Wireless mouse"]
+        product.name = "Wireless trackball"
+        product.save()
+        self.assertEqual(self.search('trackball'), [])
+
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn("Search index is up to date.", out.getvalue())
+        self.assertEqual(self.search('trackball'), ["Wireless trackball"])
+        self.assertEqual(self.search('mouse'), [])
+
+    def test_icontains_fallback_without_full_text_index(self):
+        # Other databases, or SQLite without FTS5, match the whole string as a substring.
+        with mock.patch.dict(search._fts_available, {'default': False}):
+            self.assertEqual(self.search('USB cable'), ["Braided USB cable"])
+
+
+class SiteDefinitionTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.site = {
+            'name': 'Example',
+            'home_url': 'https://www.example.com/',
+            'search_url': 'https://www.example.com/search?q={keyword}',
+            'item': '.result',
+            'fields': {
+                'name': '.title',
+                'price': '.price',
+                'reviews': '.stars',
+                'product_url': {'css': 'a.title', 'attr': 'href'},
+                'image_url': {'css': 'img', 'attr': 'src'},
+            },
+        }
+
+    def write_sites_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_valid_definition(self):
+        validate_site(self.site)
+        Scraper = build_scraper(self.site)
+        self.assertEqual(Scraper.__name__, 'ExampleScraper')
+        self.assertEqual(Scraper.website_name, 'Example')
+
+    def test_invalid_definitions_are_rejected(self):
+        cases = {
+            'missing item selector': lambda site: site.pop('item'),
+            'missing field selector': lambda site: site['fields'].pop('price'),
+            'missing search url': lambda site: site.pop('search_url'),
+            'search url without {keyword}': lambda site: site.update(search_url='https://www.example.com/search'),
+            'unknown key': lambda site: site.update(selector='.result'),
+            'invalid selector': lambda site: site.update(item='.result['),
+            'product_id without a group': lambda site: site.update(product_id=r'/item/\d+'),
+        }
+        for case, change in cases.items():
+            with self.subTest(case=case):
+                site = copy.deepcopy(self.site)
+                change(site)
+                with self.assertRaisesMessage(ImproperlyConfigured, "Site 'Example'"):
+                    validate_site(site)
+
+    def test_sites_file_adds_and_overrides_sites(self):
+        amazon = dict(SITES[0], search_url='https://smile.amazon.com/s?k={keyword}')
+        path = self.write_sites_file('sites.json', json.dumps({'sites': [self.site, amazon]}))
+        self.assertEqual(load_sites_file(path), [self.site, amazon])
+
+        with override_settings(SCRAPER_SITES_FILE=path):
+            sites = {site['name']: site for site in get_site_definitions()}
+        self.assertEqual(list(sites), [site['name'] for site in SITES] + ['Example'])
+        self.assertEqual(sites['Amazon']['search_url'], 'https://smile.amazon.com/s?k={keyword}')
+        self.assertEqual(sites['Ebay'], SITES[1])
+        self.assertEqual(build_scraper(sites['Example']).website_name, 'Example')
+
+    def test_bad_sites_file_fails_clearly(self):
+        cases = {
+            'broken.json': ('{"sites": [', "Cannot read SCRAPER_SITES_FILE"),
+            'not_a_list.json': ('{"sites": {"name": "Example"}}', "must contain a list of site definitions"),
+            'not_dicts.json': ('["Example"]', "must contain a list of site definitions"),
+        }
+        for name, (content, message) in cases.items():
+            with self.subTest(name=name):
+                with self.assertRaisesMessage(ImproperlyConfigured, message):
+                    load_sites_file(self.write_sites_file(name, content))
+        with self.assertRaisesMessage(ImproperlyConfigured, "Cannot read SCRAPER_SITES_FILE"):
+            load_sites_file(os.path.join(self.directory, 'missing.json'))
+
+
+class PriceTests(TestCase):
+
+    def test_parse_price(self):
+        cases = [
+            ("$1,299.99", (Decimal('1299.99'), 'USD')),
+            ("£12.50", (Decimal('12.50'), 'GBP')),
+            ("EUR 5", (Decimal('5.00'), 'EUR')),
+            ("US $7.5", (Decimal('7.50'), 'USD')),
+            ("1,299.", (Decimal('1299.00'), 'USD')),
+            ("$19.99 to $29.99", (Decimal('19.99'), 'USD')),
+            ("$19.99 - $29.99", (Decimal('19.99'), 'USD')),
+            ("Free", (None, 'USD')),
+            ("", (None, 'USD')),
+            (None, (None, 'USD')),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_price(text), expected)
+
+    def test_default_currency(self):
+        self.assertEqual(parse_price("12", default_currency='CAD'), (Decimal('12.00'), 'CAD'))
+        self.assertEqual(parse_price("n/a", default_currency='CAD'), (None, 'CAD'))
+
+    def test_find_best_product_ranks_by_price_value_and_sentiment(self):
+        products = create_products('laptop', 4)
+        # As strings "$9.99" sorts above "$10.00" and "$100.00"; by value it is the cheapest.
+        for product, price, sentiment in zip(products, ("$100.00", "$9.99", "$10.00", "Free"), (1.0, -0.9, 0.5, 1.0)):
+            product.price = price
+            product.price_value, product.currency = parse_price(price)
+            product.sentiment_score = sentiment
+            product.save()
+        best = find_best_product(Product.objects.all())
+        # 0.5 - 10.00 beats -0.9 - 9.99 and 1.0 - 100.00; products without a price are skipped.
+        self.assertEqual(best.id, products[2].id)
@@ -2,18 +2,32 @@ from django.shortcuts import render
 from rest_framework import status
 from django.http import HttpResponse
 from django.utils import timezone
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.urls import reverse
+from django.utils.http import urlencode
 from rest_framework import viewsets
-from .models import Product, Website
-from .serializers import ProductSerializer, WebsiteSerializer
+from .models import Product, ScrapeJob, Website
+from .serializers import ProductSerializer, ScrapeJobSerializer, WebsiteSerializer, product_values, serialize_product_rows
+from .search import full_text_filter, keyword_filter, normalize_keyword
+from .apicache import cache_response
+from .pagination import InvalidCursor, KeysetPagination
+from .jobs import enqueue_scrape, ensure_in_process_workers, stale_sites, wait_for_job
+from . import metrics as scrape_metrics
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.db.models.functions import Cast
 from rest_framework.decorators import api_view
+from rest_framework.request import Request
 from rest_framework.response import Response
-from .scrapers import AmazonScraper, EbayScraper, NeweggScraper,utils  # Add other scrapers here
+from .scrapers.engine import ScrapeEngine, SingleFlight  # Add other sites in scrapers/sites.py
+from asgiref.sync import sync_to_async
 from textblob import TextBlob
+import csv
+import itertools
 import logging
-import requests
-import threading
+import json
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +37,7 @@ def index(request):
 
 
 @api_view(['GET'])
+@cache_response('keyword', 'keyword')
 def get_keyword_data(request):
     keyword = request.query_params.get('keyword', None)
     if not keyword:
@@ -30,15 +45,19 @@ def get_keyword_data(request):
     
     try:
         logger.info(f"Searching for products with keyword: {keyword}")
-        products = Product.objects.filter(keyword__icontains=keyword)
+        products = keyword_filter(Product.objects.all(), keyword)
         # if not products.exists():
         #     logger.info(f"No products found for keyword: {keyword}")
         #     return Response({"message": "No products found for the given keyword"}, status=status.HTTP_404_NOT_FOUND)
         
-        products_data = ProductSerializer(products, many=True).data
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(product_values(products), request)
+        products_data = serialize_product_rows(page)
         logger.info(f"Found {len(products_data)} products for keyword: {keyword}")
-        return Response(products_data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(products_data)
     
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"An error occurred while fetching products: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -50,48 +69,120 @@ def scrape_and_store(request):
         return Response({'error': 'Keyword not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Check if the keyword already exists in the database
-    existing_products = Product.objects.filter(keyword__icontains=keyword)
+    existing_products = keyword_filter(Product.objects.all(), keyword)
     if existing_products.exists():
-        products_data = ProductSerializer(existing_products, many=True).data
-        return Response(products_data, status=status.HTTP_200_OK)
+        # Serve the stored products right away; stale sites are refreshed in the background.
+        try:
+            products_data = first_page_data(request, keyword, existing_products)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(products_data, status=status.HTTP_200_OK)
+        stale = stale_sites(keyword)
+        response['X-Cache'] = 'STALE' if stale else 'HIT'
+        if stale:
+            job = enqueue_scrape(keyword, sites=stale)
+            ensure_in_process_workers()
+            response['X-Scrape-Job'] = job_response_data(request, job)['status_url']
+        return response
 
-    urls = [
-        f'https://www.amazon.com/s?k={keyword}',
-        f'https://www.ebay.com/sch/i.html?_nkw={keyword}',
-        f'https://www.newegg.com/p/pl?d={keyword}'
-    ]
+    # Scraping takes minutes: queue it and let the client poll the job.
+    job = enqueue_scrape(keyword)
+    ensure_in_process_workers()
+    return Response(job_response_data(request, job), status=status.HTTP_202_ACCEPTED)
 
-    scrapers = [AmazonScraper.AmazonScraper, EbayScraper.EbayScraper, NeweggScraper.NeweggScraper]
+def keyword_data_url(request, keyword):
+    return request.build_absolute_uri(f"{reverse('get_keyword_data')}?{urlencode({'keyword': keyword})}")
 
-    def run_scraper(Scraper, url):
-        try:
-            scraper = Scraper(url)
-            scraper.scrape(keyword)  # Pass the keyword to the scrape method
-        except requests.exceptions.RequestException as e:
-            logging.error(f'Network error occurred while scraping {url}: {str(e)}')
-        except Exception as e:
-            logging.error(f'An unexpected error occurred while scraping {url}: {str(e)}')
-
-    threads = []
-    for url, Scraper in zip(urls, scrapers):
-        thread = threading.Thread(target=run_scraper, args=(Scraper, url))
-        threads.append(thread)
-        thread.start()
-
-    for thread in threads:
-        thread.join()
-
-    # Fetch the newly scraped data
+def first_page_data(request, keyword, products):
+    """
+    Returns the first page of the keyword's products in the get_keyword_data format,
+    with its cursor links pointing to get_keyword_data.
+    """
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(product_values(products), request, base_url=keyword_data_url(request, keyword))
+    return paginator.get_paginated_data(serialize_product_rows(page))
+
+def job_response_data(request, job):
+    data = ScrapeJobSerializer(job).data
+    data['status_url'] = request.build_absolute_uri(reverse('scrape_job_status', args=[job.id]))
+    # The job's products are read page by page from get_keyword_data.
+    data['products_url'] = keyword_data_url(request, job.keyword)
+    return data
+
+@api_view(['GET'])
+def scrape_job_status(request, job_id):
+    """
+    Returns the status of a scrape job; once it is done, its products are listed by
+    the get_keyword_data URL in `products_url`.
+
+    Pass ?wait=<seconds> to long-poll: the response is delayed until the job finishes
+    or the wait (capped at SCRAPE_JOB_MAX_WAIT) expires.
+    """
     try:
-        new_products = Product.objects.filter(keyword__icontains=keyword)
-        if not new_products.exists():
-            return Response({'error': 'Failed to scrape data'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        job = ScrapeJob.objects.get(id=job_id)
+    except ScrapeJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        products_data = ProductSerializer(new_products, many=True).data
-        return Response(products_data, status=status.HTTP_200_OK)
-    
-    except Exception as e:
-        return Response({'error': f'An unexpected error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), getattr(settings, 'SCRAPE_JOB_MAX_WAIT', 30))
+    except ValueError:
+        return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+    if wait > 0:
+        wait_for_job(job, wait)
+
+    return Response(job_response_data(request, job), status=status.HTTP_200_OK)
+
+# Concurrent async requests for the same keyword share one scrape.
+_inflight_scrapes = SingleFlight()
+
+async def scrape_and_store_async(request):
+    """
+    Async counterpart of scrape_and_store for ASGI deployments.
+
+    All sites and results pages are scraped concurrently by the ScrapeEngine, so the
+    request takes about as long as the slowest site.
+    Concurrent requests for the same normalized keyword wait for one shared scrape.
+    Stored products are returned at once; their stale sites are refreshed by the
+    scrape workers, as in scrape_and_store. The response is the first page of the
+    products in the get_keyword_data format.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        keyword = json.loads(request.body or b'{}').get('keyword')
+    except (ValueError, AttributeError):
+        keyword = None
+    if not keyword:
+        return JsonResponse({'error': 'Keyword not provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def load_products(refresh=False):
+        products = keyword_filter(Product.objects.all(), keyword)
+        if not products.exists():
+            return None
+        stale = refresh and stale_sites(keyword)
+        if stale:
+            # Stale-while-revalidate: the scrape workers refresh the stale sites.
+            enqueue_scrape(keyword, sites=stale)
+            ensure_in_process_workers()
+        return first_page_data(Request(request), keyword, products)
+
+    try:
+        products_data = await sync_to_async(load_products)(refresh=True)
+        if products_data is None:
+            await _inflight_scrapes.run(normalize_keyword(keyword), ScrapeEngine().scrape_keyword, keyword)
+            products_data = await sync_to_async(load_products)()
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if products_data is None:
+        return JsonResponse({'error': 'Failed to scrape data'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return JsonResponse(products_data, encoder=DjangoJSONEncoder, status=status.HTTP_200_OK)
+
+# Like the DRF API views; csrf_exempt() cannot wrap async views before Django 5.0.
+scrape_and_store_async.csrf_exempt = True
+
+def metrics(request):
+    # Prometheus scrape target; see product_hunt/metrics.py.
+    return HttpResponse(scrape_metrics.REGISTRY.render(), content_type=scrape_metrics.CONTENT_TYPE)
 
 def current_time(request):
     now = timezone.now()
@@ -99,14 +190,59 @@ def current_time(request):
     return HttpResponse(html)
 
 def product_list(request):
-    products = Product.objects.all()
-    if not products:
+    paginator = Paginator(Product.objects.order_by('id'), getattr(settings, 'PRODUCT_LIST_PAGE_SIZE', 50))
+    if not paginator.count:
         message = "No products found."
         return render(request, 'product_hunt/no_products.html', {'message': message})
-    return render(request, 'product_hunt/product_list.html', {'products': products})
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'product_hunt/product_list.html', {'products': page, 'page': page})
+
+EXPORT_FIELDS = [
+    'id', 'name', 'price', 'price_value', 'currency', 'reviews', 'product_url', 'image_url',
+    'website', 'sentiment_score', 'sentiment_label', 'keyword', 'scraped_at',
+]
+
+class Echo:
+    """
+    File-like object whose write() returns the data, so csv.writer rows can be streamed.
+    """
+    def write(self, value):
+        return value
+
+def export_products(request):
+    """
+    Streams products as NDJSON (default) or CSV.
+
+    Filter with ?keyword= or ?query= (product name) as in the API endpoints; without
+    either every product is exported. Rows are read with .iterator() and written as
+    they are fetched, so memory use does not grow with the number of rows.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return JsonResponse({'error': 'format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+
+    products = Product.objects.all()
+    if request.GET.get('keyword'):
+        products = keyword_filter(products, request.GET['keyword'], rank=False)
+    if request.GET.get('query'):
+        products = full_text_filter(products, 'name', request.GET['query'], rank=False)
+    rows = products.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        content = itertools.chain([writer.writerow(EXPORT_FIELDS)], (writer.writerow(row) for row in rows))
+        content_type = 'text/csv'
+    else:
+        encoder = DjangoJSONEncoder()
+        content = (encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+        content_type = 'application/x-ndjson'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+    return response
 
 
 @api_view(['GET'])
+@cache_response('name', 'query')
 def search_products(request):
     query = request.GET.get('query', '')
     
@@ -114,36 +250,39 @@ def search_products(request):
         return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        products = Product.objects.filter(name__icontains=query)
+        products = full_text_filter(Product.objects.all(), 'name', query)
         if not products.exists():
             return Response({'message': 'No products found'}, status=status.HTTP_404_NOT_FOUND)
 
-        product_serializer = ProductSerializer(products, many=True)
-        
-        for product in products:
-            product.sentiment_score = utils.sentiment_score(product.reviews)
-            product.save()
+        # Sentiment is computed when products are scraped; searching never writes.
+        paginator = KeysetPagination()
+        page = serialize_product_rows(paginator.paginate_queryset(product_values(products), request))
 
         best_product = find_best_product(products)
 
-        return Response({
-            'products': product_serializer.data,
-            'best_product': ProductSerializer(best_product).data if best_product else None
-        }, status=status.HTTP_200_OK)
+        data = paginator.get_paginated_data(page, results_key='products')
+        data['best_product'] = ProductSerializer(best_product).data if best_product else None
+        return Response(data, status=status.HTTP_200_OK)
 
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 def find_best_product(products):
     """
     Finds the best product based on price and sentiment score.
+
+    The score is computed and ordered by the database, so only the winning row is fetched.
     """
-    best_product = None
-    highest_score = float('-inf')
-    
-    for product in products:
-        score = product.sentiment_score - product.price  # Example scoring formula
-        if score > highest_score:
-            highest_score = score
-            best_product = product
-    return best_product
+    score = ExpressionWrapper(
+        F('sentiment_score') - Cast('price_value', FloatField()),  # Example scoring formula
+        output_field=FloatField(),
+    )
+    return (
+        products.filter(price_value__isnull=False)
+        .select_related('website')
+        .annotate(score=score)
+        .order_by('-score', 'id')
+        .first()
+    )